@@ -1,3 +1,59 @@
 from django.contrib import admin
 
+from .models import User, Product, ProductStock, Distrib, Notification, StockMovement
+
 # Register your models here.
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    list_display = ('username', 'firstname', 'lastname', 'role', 'status')
+    list_filter = ('role', 'status')
+    search_fields = ('username', 'firstname', 'lastname')
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('product_id', 'product_name', 'barcode_no', 'product_qty', 'product_expiry', 'is_archived')
+    list_filter = ('is_archived',)
+    search_fields = ('product_id', 'product_name', 'barcode_no')
+
+    def get_queryset(self, request):
+        return Product.all_objects.all()
+
+
+@admin.register(ProductStock)
+class ProductStockAdmin(admin.ModelAdmin):
+    list_display = ('product_name', 'on_hand', 'distributed', 'active_batches', 'earliest_expiry')
+    search_fields = ('product_name',)
+
+
+# list_select_related keeps the product columns in the changelist query instead of one query per row
+@admin.register(Distrib)
+class DistribAdmin(admin.ModelAdmin):
+    list_display = ('distrib_id', 'product', 'distrib_quantity', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    list_select_related = ('product',)
+    raw_id_fields = ('product',)
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'notif_type', 'message', 'updated_at')
+    list_filter = ('notif_type',)
+    list_select_related = ('product',)
+    raw_id_fields = ('product',)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('movement_id', 'created_at', 'kind', 'product_id', 'product_name', 'quantity', 'distrib_id')
+    list_filter = ('kind',)
+    search_fields = ('product_name', 'product__product_id')
+    raw_id_fields = ('product', 'distrib')
+
+    # append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Product, Notification, AlertScanState, LOW_STOCK, with_reorder_levels
+
+SCAN_NAME = 'inventory_alerts'
+# updated_at is set before commit, so a row can land behind the watermark after a scan
+# has read past it. Each scan re-reads this much before the last one; the repeats merge
+# into the existing notifications.
+SCAN_OVERLAP = timedelta(minutes=5)
+ALERT_COLUMNS = ('product_id', 'product_name', 'product_qty', 'product_expiry')
+
+
+@transaction.atomic
+def scan_inventory_alerts(full=False, chunk_size=5000):
+    now = timezone.now()
+    horizon = now.date() + timedelta(days=Product.EXPIRY_WARNING_DAYS)
+    state = AlertScanState.objects.select_for_update().filter(name=SCAN_NAME).first()
+    if full or state is None:
+        changed = Q()
+        entered_horizon = Q()
+    else:
+        # rows written since the last run, plus batches whose expiry crossed into the horizon
+        changed = Q(updated_at__gt=state.scanned_at - SCAN_OVERLAP, updated_at__lte=now)
+        entered_horizon = Q(product_expiry__gt=state.expiry_horizon) | changed
+
+    open_batches = Product.objects.filter(product_qty__gt=0)
+    expiring = open_batches.filter(entered_horizon, product_expiry__lte=horizon)
+    low_stock = with_reorder_levels(open_batches).filter(changed, LOW_STOCK)
+
+    counts = {'expiring_soon': 0, 'low_stock': 0}
+    pending = []
+
+    def emit(notif_type, rows, message):
+        for product_id, product_name, product_qty, product_expiry in rows:
+            pending.append(Notification(
+                notif_type=notif_type,
+                product_id=product_id,
+                message=message(product_name, product_qty, product_expiry),
+            ))
+            counts[notif_type] += 1
+            if len(pending) >= chunk_size:
+                Notification.objects.upsert(pending[:])
+                pending.clear()
+
+    emit(
+        'expiring_soon',
+        expiring.values_list(*ALERT_COLUMNS).iterator(chunk_size=chunk_size),
+        lambda name, qty, expiry: f"{name} is expiring on {expiry}.",
+    )
+    emit(
+        'low_stock',
+        low_stock.values_list(*ALERT_COLUMNS).iterator(chunk_size=chunk_size),
+        lambda name, qty, expiry: f"{name} is low on stock: {qty} left.",
+    )
+    Notification.objects.upsert(pending)
+
+    AlertScanState.objects.update_or_create(
+        name=SCAN_NAME,
+        defaults={'scanned_at': now, 'expiry_horizon': horizon},
+    )
+    return counts
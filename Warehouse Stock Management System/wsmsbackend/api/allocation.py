@@ -0,0 +1,382 @@
+import time
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When, Window, RowRange
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Product, ProductStock, Distrib, DistribAllocation, Notification, InventoryVersion, with_reorder_levels,
+    inventory_write, low_stock,
+)
+from .barcodes import forget_batches
+from .ledger import movements, write
+from . import metrics
+
+FIFO_ORDER = [F('product_expiry').asc(), F('product_id').asc()]
+
+
+def lock_fifo_heads(quantities):
+    # Lock only the oldest open batches that cover each product's quantity, plus the next
+    # head batch, rather than every open batch: a windowed read finds where FIFO stops for
+    # all the products at once, then those prefixes are locked. A product whose stock moved
+    # in between, so its prefix no longer covers the quantity, has everything locked as before.
+    if not quantities:
+        return {}
+    open_batches = Product.objects.filter(product_name__in=quantities.keys(), product_qty__gt=0)
+    prefix = list(
+        open_batches
+        .annotate(
+            wanted=Case(*[When(product_name=name, then=Value(quantity)) for name, quantity in quantities.items()]),
+            # stock ahead of the previous batch; below the quantity, the previous batch is
+            # still drawn on, so this one is either drawn on too or becomes the head
+            drawn_before_previous=Coalesce(
+                Window(Sum('product_qty'), partition_by=F('product_name'), order_by=FIFO_ORDER, frame=RowRange(end=-2)),
+                0,
+            ),
+        )
+        .filter(drawn_before_previous__lt=F('wanted'))
+        .values_list('product_id', flat=True)
+    )
+
+    batches = {name: [] for name in quantities}
+    for batch in open_batches.select_for_update().filter(product_id__in=prefix).order_by('product_name', *FIFO_ORDER):
+        batches[batch.product_name].append(batch)
+    for name, quantity in quantities.items():
+        if sum(batch.product_qty for batch in batches[name]) <= quantity:
+            batches[name] = list(open_batches.filter(product_name=name).select_for_update().order_by(*FIFO_ORDER))
+    return batches
+
+
+def lock_fifo_head(product_name, quantity):
+    return lock_fifo_heads({product_name: quantity})[product_name]
+
+
+def take_fifo(batches, quantity):
+    # Deduct in memory; batches are left untouched if there is not enough stock
+    allocations = []
+    remaining = quantity
+    for batch in batches:
+        if remaining == 0:
+            break
+        if batch.product_qty == 0:
+            continue
+        taken = min(batch.product_qty, remaining)
+        batch.product_qty -= taken
+        remaining -= taken
+        allocations.append((batch, taken))
+
+    if remaining > 0:
+        for batch, taken in allocations:
+            batch.product_qty += taken
+        raise ValidationError("Not enough stock to fulfill the new distribution quantity.")
+
+    return allocations
+
+
+def earliest_expiry(batches):
+    return next((batch.product_expiry for batch in batches if batch.product_qty > 0), None)
+
+
+def write_batches(batches):
+    # One UPDATE for every touched batch and one INSERT for all notifications.
+    # Callers adjust ProductStock first, so low-stock checks see the new totals.
+    now = timezone.now()
+    notifications = []
+    stock = ProductStock.objects.in_bulk({batch.product_name for batch in batches}) if batches else {}
+    for batch in batches:
+        batch.updated_at = now
+        batch.version += 1
+        if batch.product_qty == 0:
+            batch.is_archived = True
+            batch.archived_at = now
+            notifications.append(Notification(
+                notif_type='archived',
+                product=batch,
+                message=f"{batch.product_name} has been archived due to zero stock."
+            ))
+            continue
+        if batch.is_low_stock(stock.get(batch.product_name)):
+            notifications.append(Notification(
+                notif_type='low_stock',
+                product=batch,
+                message=f"{batch.product_name} is low on stock: {batch.product_qty} left."
+            ))
+        if batch.is_expiring_soon():
+            notifications.append(Notification(
+                notif_type='expiring_soon',
+                product=batch,
+                message=f"{batch.product_name} is expiring on {batch.product_expiry}."
+            ))
+
+    if batches:
+        Product.all_objects.bulk_update(batches, ['product_qty', 'is_archived', 'archived_at', 'updated_at', 'version'])
+        InventoryVersion.objects.bump()
+        forget_batches(batches)
+    Notification.objects.queue(notifications)
+    metrics.FIFO_NOTIFICATIONS.inc(len(notifications))
+    return notifications
+
+
+def insert_distribs(distribs):
+    # One INSERT for the whole order. Allocation rows and ledger movements need the new
+    # distrib_ids; backends that don't return them (MySQL) read them back by the order's
+    # pick_list token, in id order, which is insert order.
+    token = uuid.uuid4()
+    for distrib in distribs:
+        distrib.pick_list = token
+    Distrib.objects.bulk_create(distribs)
+    if distribs and distribs[0].pk is None:
+        ids = Distrib.objects.filter(pick_list=token).order_by('distrib_id').values_list('distrib_id', flat=True)
+        for distrib, distrib_id in zip(distribs, ids):
+            distrib.pk = distrib_id
+
+
+def record_allocation(entry_point, started, batches_touched):
+    metrics.FIFO_ALLOCATIONS.inc(entry_point=entry_point)
+    metrics.FIFO_SECONDS.observe(time.perf_counter() - started, entry_point=entry_point)
+    metrics.FIFO_BATCHES.observe(batches_touched, entry_point=entry_point)
+
+
+@inventory_write()
+def allocate_fifo(product_name, quantity):
+    started = time.perf_counter()
+    batches = lock_fifo_head(product_name, quantity)
+    allocations = take_fifo(batches, quantity)
+    touched = [batch for batch, _ in allocations]
+
+    emptied = sum(1 for batch in touched if batch.product_qty == 0)
+    ProductStock.objects.adjust(
+        product_name,
+        on_hand=-quantity,
+        active_batches=-emptied,
+        earliest_expiry=earliest_expiry(batches),
+    )
+    write_batches(touched)
+
+    head = next((batch for batch in batches if batch.product_qty > 0), touched[0] if touched else None)
+    record_allocation('distribution', started, len(touched))
+    return allocations, head
+
+
+def preview_fifo(product_name, quantity):
+    # What allocate_fifo would draw, in one query and without locking or writing: a running
+    # sum over the same FIFO order gives what earlier batches cover, so only the batches the
+    # quantity reaches come back, each with the product's total and reorder point alongside
+    rows = list(
+        with_reorder_levels(Product.objects.filter(product_name=product_name, product_qty__gt=0))
+        .annotate(
+            drawn_before=Coalesce(Window(Sum('product_qty'), order_by=FIFO_ORDER, frame=RowRange(end=-1)), 0),
+            available=Window(Sum('product_qty')),
+        )
+        .filter(drawn_before__lt=quantity)
+        .order_by('product_expiry', 'product_id')
+        .values('product_id', 'product_expiry', 'product_qty', 'drawn_before', 'available', 'reorder_point')
+    )
+
+    available = rows[0]['available'] if rows else 0
+    on_hand_after = max(available - quantity, 0)
+    batches = []
+    for row in rows:
+        taken = min(row['product_qty'], quantity - row['drawn_before'])
+        left = row['product_qty'] - taken
+        batches.append({
+            'product_id': row['product_id'],
+            'product_expiry': row['product_expiry'],
+            'product_qty': row['product_qty'],
+            'quantity': taken,
+            'remaining': left,
+            'archived': left == 0,
+            # emptied batches are archived rather than flagged low
+            'low_stock': left > 0 and low_stock(left, on_hand_after, row['reorder_point']),
+        })
+
+    return {
+        'product_name': product_name,
+        'quantity': quantity,
+        'on_hand': available,
+        'on_hand_after': on_hand_after,
+        'enough_stock': quantity <= available,
+        'shortfall': max(quantity - available, 0),
+        'batches': batches,
+    }
+
+
+@inventory_write()
+def return_allocations(distrib, quantity):
+    # Hand `quantity` back to the batches this distribution drew from, latest expiry first,
+    # reopening any that were archived empty. Batches archived by hand with stock left stay
+    # archived and are skipped. Returns ([(batch, amount)], units not placed).
+    allocations = list(
+        distrib.allocations
+        .select_related('product')
+        .select_for_update()
+        .order_by('-product__product_expiry', '-product_id')
+    )
+    now = timezone.now()
+    returned = []
+    reopened = 0
+    remaining = quantity
+    for allocation in allocations:
+        if remaining == 0:
+            break
+        batch = allocation.product
+        if batch.is_archived and batch.product_qty > 0:
+            continue
+        amount = min(allocation.quantity, remaining, Product.MAX_STOCK - batch.product_qty)
+        if amount <= 0:
+            continue
+        if batch.is_archived:
+            batch.is_archived = False
+            batch.archived_at = None
+            reopened += 1
+        batch.product_qty += amount
+        batch.updated_at = now
+        batch.version += 1
+        allocation.quantity -= amount
+        remaining -= amount
+        returned.append((batch, amount, allocation))
+
+    if not returned:
+        return [], remaining
+
+    Product.all_objects.bulk_update(
+        [batch for batch, _, _ in returned], ['product_qty', 'is_archived', 'archived_at', 'updated_at', 'version']
+    )
+    InventoryVersion.objects.bump()
+    forget_batches([batch for batch, _, _ in returned])
+    changed = [allocation for _, _, allocation in returned]
+    DistribAllocation.objects.filter(pk__in=[a.pk for a in changed if a.quantity == 0]).delete()
+    DistribAllocation.objects.bulk_update([a for a in changed if a.quantity > 0], ['quantity'])
+
+    product_name = distrib.product.product_name
+    ProductStock.objects.adjust(product_name, on_hand=quantity - remaining, active_batches=reopened)
+    ProductStock.objects.refresh_expiry(product_name)
+    return [(batch, amount) for batch, amount, _ in returned], remaining
+
+
+@inventory_write()
+def restore_lifo(product_name, quantity):
+    # Put stock back into the newest open batches first, up to MAX_STOCK each
+    batches = list(
+        Product.objects
+        .select_for_update()
+        .filter(product_name=product_name)
+        .order_by('product_expiry', 'product_id')
+    )
+    touched = []
+    remaining = quantity
+    for batch in reversed(batches):
+        if remaining == 0:
+            break
+        restore_amount = min(Product.MAX_STOCK - batch.product_qty, remaining)
+        if restore_amount <= 0:
+            continue
+        batch.product_qty += restore_amount
+        remaining -= restore_amount
+        touched.append((batch, restore_amount))
+
+    if remaining > 0:
+        raise ValidationError("Failed to restore full original stock — data may be inconsistent.")
+
+    if touched:
+        now = timezone.now()
+        for batch, _ in touched:
+            batch.updated_at = now
+            batch.version += 1
+        Product.objects.bulk_update([batch for batch, _ in touched], ['product_qty', 'updated_at', 'version'])
+        InventoryVersion.objects.bump()
+        forget_batches([batch for batch, _ in touched])
+    ProductStock.objects.adjust(
+        product_name,
+        on_hand=quantity,
+        earliest_expiry=earliest_expiry(batches),
+    )
+    return touched
+
+
+@inventory_write()
+def allocate_pick_list(lines, best_effort=False):
+    # Allocate every line of an order against one locked snapshot of batch stock.
+    # Returns (results, accepted); nothing is written unless accepted.
+    started = time.perf_counter()
+    product_ids = {line['product_id'] for line in lines if line.get('product_id')}
+    names_by_id = dict(
+        Product.all_objects
+        .filter(product_id__in=product_ids)
+        .values_list('product_id', 'product_name')
+    ) if product_ids else {}
+
+    names = [line.get('product_name') or names_by_id.get(line.get('product_id')) for line in lines]
+    wanted = {}
+    for line, name in zip(lines, names):
+        if name:
+            wanted[name] = wanted.get(name, 0) + line['quantity']
+    batches = lock_fifo_heads(wanted)
+
+    results = []
+    created = []
+    touched = {}
+    for line, name in zip(lines, names):
+        result = {'product_name': name, 'quantity': line['quantity']}
+        if line.get('product_id'):
+            result['product_id'] = line['product_id']
+        results.append(result)
+
+        if name is None:
+            result.update(status='error', error="Product batch does not exist.")
+            continue
+        try:
+            allocations = take_fifo(batches[name], line['quantity'])
+        except ValidationError:
+            result.update(status='error', error="Insufficient total stock across all batches.")
+            continue
+
+        for batch, _ in allocations:
+            touched[batch.product_id] = batch
+        head = next((batch for batch in batches[name] if batch.product_qty > 0), allocations[0][0])
+        created.append((result, Distrib(product=head, distrib_quantity=line['quantity']), allocations))
+        result.update(
+            status='ok',
+            batches=[{'product_id': batch.product_id, 'quantity': taken} for batch, taken in allocations],
+        )
+
+    accepted = best_effort or len(created) == len(lines)
+    if not accepted:
+        return results, False
+
+    distribs = [distrib for _, distrib, _ in created]
+    changes = {}
+    for batch in touched.values():
+        change = changes.setdefault(batch.product_name, {'on_hand': 0, 'distributed': 0, 'active_batches': 0})
+        if batch.product_qty == 0:
+            change['active_batches'] -= 1
+    for distrib in distribs:
+        change = changes[distrib.product.product_name]
+        change['on_hand'] -= distrib.distrib_quantity
+        change['distributed'] += distrib.distrib_quantity
+    for name, change in changes.items():
+        change['earliest_expiry'] = earliest_expiry(batches[name])
+    ProductStock.objects.adjust_many(changes)
+
+    write_batches(list(touched.values()))
+    insert_distribs(distribs)
+
+    ledger = []
+    for _, distrib, allocations in created:
+        ledger += movements('distribute', [(batch, -taken) for batch, taken in allocations], distrib)
+    ledger += movements('archive', [(batch, 0) for batch in touched.values() if batch.is_archived])
+    write(ledger)
+    DistribAllocation.objects.bulk_create([
+        DistribAllocation(distrib=distrib, product=batch, quantity=taken)
+        for _, distrib, allocations in created
+        for batch, taken in allocations
+    ])
+
+    for result, distrib, _ in created:
+        result['distrib_id'] = distrib.pk
+
+    record_allocation('pick_list', started, len(touched))
+    return results, True
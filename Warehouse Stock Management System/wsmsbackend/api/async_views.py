@@ -0,0 +1,139 @@
+import json
+from functools import wraps
+
+from django.http import HttpResponse, JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from .asyncdb import read_query
+from .authentication import ClaimsJWTAuthentication
+from .barcodes import resolver
+from .cache import aversioned_response
+from .models import Product, ProductStock, Distrib, aget_inventory_distribution_summary
+from .pagination import KeysetPagination
+from .serializers import ProductSerializer, DistribSerializer, BarcodeBatchSerializer
+from .views import ProductList, DistribList, flag_param
+
+# Async read endpoints for ASGI deployments. Same data as the DRF views under /api/,
+# served under /api/async/. DRF views are sync-only, so these are plain Django async
+# views: JWT cookie auth, JSON out. The caller is authenticated before the view runs,
+# so anonymous requests cost no view queries; views may run their own reads concurrently.
+
+
+async def authenticate(request):
+    try:
+        result = await read_query(ClaimsJWTAuthentication().authenticate, request)
+    except AuthenticationFailed as e:
+        return e.detail
+    if result is None or not result[0].is_active:
+        return 'Authentication credentials were not provided.'
+    return None
+
+
+def async_api_view(methods):
+    def decorator(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            # DRF request wrapper for query_params, so flag_param and the paginator work unchanged
+            request = Request(request)
+            error = await authenticate(request)
+            if error is not None:
+                return JsonResponse({'detail': str(error)}, status=401)
+            data = await view(request, *args, **kwargs)
+            if isinstance(data, HttpResponse):
+                return data
+            return JsonResponse(data, safe=False)
+        # same as DRF's APIView: JWT cookie auth, no session CSRF check
+        wrapped.csrf_exempt = True
+        return wrapped
+    return decorator
+
+
+async def list_response(queryset, request, view, serializer_class):
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(queryset, request, view)
+    if page is not None:
+        return paginator.get_paginated_data(serializer_class(page, many=True).data)
+    return serializer_class([row async for row in queryset], many=True).data
+
+# ------------------------- PRODUCT VIEWS -------------------------
+
+@async_api_view(['GET'])
+async def product_list(request):
+    products = Product.all_objects.all()
+    archived = flag_param(request, 'archived', False)
+    if archived is not None:
+        products = products.filter(is_archived=archived)
+    if request.query_params.get('product_name'):
+        products = products.filter(product_name=request.query_params['product_name'])
+    return await list_response(products, request, ProductList, ProductSerializer)
+
+
+@async_api_view(['GET'])
+async def product_detail(request, product_id):
+    product = await Product.objects.filter(product_id=product_id).afirst()
+    if product is None:
+        return JsonResponse({'error': 'Product not found.'}, status=404)
+    return ProductSerializer(product).data
+
+
+@async_api_view(['GET'])
+async def product_by_barcode(request, barcode_no):
+    product = await resolver.aresolve(barcode_no)
+    if product is None:
+        return JsonResponse({'error': 'Product not found.'}, status=404)
+    return product
+
+
+@async_api_view(['POST'])
+async def products_by_barcodes(request):
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Body must be JSON.'}, status=400)
+    serializer = BarcodeBatchSerializer(data=body)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    barcodes = serializer.validated_data['barcodes']
+    products = await resolver.aresolve_many(barcodes)
+    return {
+        'results': products,
+        'not_found': [barcode for barcode in dict.fromkeys(barcodes) if barcode not in products],
+    }
+
+# ------------------------- DISTRIBUTION VIEWS -------------------------
+
+@async_api_view(['GET'])
+async def distrib_list(request):
+    distribs = Distrib.objects.select_related('product')
+    active = flag_param(request, 'active', True)
+    if active is not None:
+        distribs = distribs.filter(is_active=active)
+    if request.query_params.get('product_name'):
+        distribs = distribs.filter(product__product_name=request.query_params['product_name'])
+    return await list_response(distribs, request, DistribList, DistribSerializer)
+
+
+@async_api_view(['GET'])
+async def distrib_detail(request, distrib_id):
+    distrib = await Distrib.objects.select_related('product').filter(distrib_id=distrib_id).afirst()
+    if distrib is None:
+        return JsonResponse({'error': 'Distribution not found.'}, status=404)
+    return DistribSerializer(distrib).data
+
+# ------------------------- SUMMARY VIEWS -------------------------
+
+@async_api_view(['GET'])
+@aversioned_response('grouped-products')
+async def grouped_product_summary(request):
+    rows = ProductStock.objects.values('product_name', 'on_hand').order_by('product_name')
+    return [{'product_name': row['product_name'], 'total_quantity': row['on_hand']} async for row in rows]
+
+
+@async_api_view(['GET'])
+@aversioned_response('inventory-summary')
+async def inventory_distribution_summary(request):
+    return await aget_inventory_distribution_summary()
@@ -0,0 +1,35 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection
+
+
+# Django's async ORM runs every query of a request on that request's one sync thread,
+# so awaiting two querysets with asyncio.gather still executes them back to back.
+# Reads that really are independent go through read_query instead: each gets its own
+# thread and connection, so the round trips overlap.
+
+def on_own_connection(func):
+    def run(*args):
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return run
+
+
+async def in_transaction():
+    return await sync_to_async(lambda: connection.in_atomic_block)()
+
+
+async def read_query(func, *args):
+    # Inside a transaction (ATOMIC_REQUESTS, tests) the read has to see uncommitted
+    # writes, so it stays on the request's own connection
+    if await in_transaction():
+        return await sync_to_async(func)(*args)
+    return await sync_to_async(on_own_connection(func), thread_sensitive=False)(*args)
+
+
+async def gather_reads(*calls):
+    # calls: (func, *args) tuples
+    return await asyncio.gather(*(read_query(*call) for call in calls))
@@ -1,7 +1,16 @@
 # api/authentication.py
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
+import time
+
 from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+CLAIMS = ('username', 'role', 'status')
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -11,3 +20,107 @@ class CookieJWTAuthentication(JWTAuthentication):
             return None
         validated_token = self.get_validated_token(raw_token)
         return self.get_user(validated_token), validated_token
+
+
+# ------------------------- SIGNED CLAIMS -------------------------
+
+def claims_cache():
+    return caches[getattr(settings, 'AUTH_CLAIMS_CACHE_ALIAS', 'default')]
+
+
+# Per-process copy of the shared cache's answers, so a warm request runs no query at all.
+# Entries live AUTH_CLAIMS_LOCAL_SECONDS: a change made on another worker is picked up
+# within that long, a change made on this worker at once.
+local_claims = {}
+
+
+def local_seconds():
+    return getattr(settings, 'AUTH_CLAIMS_LOCAL_SECONDS', 10)
+
+
+def remember_change(username, change):
+    now = time.monotonic()
+    if len(local_claims) > 10000:
+        for name in [name for name, (expires, _) in local_claims.items() if expires <= now]:
+            local_claims.pop(name, None)
+    local_claims[username] = (now + local_seconds(), change)
+
+
+def claims_change(username):
+    cached = local_claims.get(username)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    change = claims_cache().get(claims_key(username))
+    remember_change(username, change)
+    return change
+
+
+def claims_key(username):
+    return f'auth-claims:{username}'
+
+
+def user_claims(auth_user):
+    # username/role/status embedded at login, from the tbl_user row matching the login username
+    from .models import User
+    profile = User.objects.filter(username=auth_user.username).values('role', 'status').first() or {}
+    return {'username': auth_user.username, 'role': profile.get('role'), 'status': profile.get('status')}
+
+
+def embed_claims(token, claims):
+    for name in CLAIMS:
+        token[name] = claims[name]
+    return token
+
+
+def invalidate_user_claims(username, claims=None):
+    # Tokens issued before now carry stale claims: replace them with `claims`, or reject
+    # them when claims is None (user removed). Kept as long as a refresh token can live,
+    # since refreshing copies claims into new access tokens.
+    lifetime = settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"].total_seconds()
+    change = {'changed_at': time.time(), 'claims': claims}
+    claims_cache().set(claims_key(username), change, timeout=lifetime)
+    remember_change(username, change)
+
+
+def user_changed(old_username, user=None):
+    # update_user/delete_user hook; user is the saved tbl_user row, None once deleted
+    if user is None:
+        invalidate_user_claims(old_username)
+    elif user.username == old_username:
+        invalidate_user_claims(old_username, {'username': old_username, 'role': user.role, 'status': user.status})
+    else:
+        invalidate_user_claims(old_username, {'username': old_username, 'role': None, 'status': None})
+
+
+def current_claims(token):
+    # None if the user was removed after the token was issued
+    claims = {name: token.get(name) for name in CLAIMS}
+    change = claims_change(claims['username'])
+    if change is None or token.get('iat', 0) >= change['changed_at']:
+        return claims
+    return change['claims']
+
+
+class ClaimsUser(TokenUser):
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def status(self):
+        return self.token.get('status')
+
+
+# Trusts the username/role/status signed into the token at login instead of loading the
+# user row on every request. update_user/delete_user record changes in the claims cache,
+# so steady-state requests authenticate with zero queries. Tokens issued before this
+# mode existed have no claims and fall back to the database lookup.
+# AUTH_CLAIMS_CACHE_ALIAS must be a cache shared by all workers (see settings.CACHES).
+class ClaimsJWTAuthentication(CookieJWTAuthentication):
+    def get_user(self, validated_token):
+        if 'username' not in validated_token:
+            return super().get_user(validated_token)
+        claims = current_claims(validated_token)
+        if claims is None:
+            raise AuthenticationFailed('User no longer exists.', code='user_not_found')
+        return ClaimsUser({**validated_token.payload, **claims})
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Window
+from django.db.models.functions import RowNumber
+
+from .asyncdb import gather_reads
+from .models import Product, ProductStock
+from .serializers import ProductSerializer
+
+LOOKUP_CHUNK = 100
+
+
+def cache_seconds():
+    return getattr(settings, 'BARCODE_CACHE_SECONDS', 5)
+
+
+# Maps a barcode to its FIFO head batch (oldest open batch) plus the product's total stock.
+# Entries live in a per-process LRU, so a warm scan runs no query at all. A stock write on
+# this worker drops the entries for the barcodes and products it touched once it commits;
+# a write on another worker is picked up when the entry expires, BARCODE_CACHE_SECONDS on.
+class BarcodeResolver:
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        # moved by every forget(), so a lookup that raced a write isn't stored
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, barcodes):
+        # only the head of each barcode comes back: open batches numbered in FIFO order
+        # per barcode, keeping number 1
+        heads = (
+            Product.objects
+            .filter(barcode_no__in=barcodes, product_qty__gt=0)
+            .annotate(
+                fifo_position=Window(
+                    RowNumber(),
+                    partition_by=F('barcode_no'),
+                    order_by=[F('product_expiry').asc(), F('product_id').asc()],
+                ),
+                total_stock=Subquery(
+                    ProductStock.objects.filter(product_name=OuterRef('product_name')).values('on_hand')[:1]
+                ),
+            )
+            .filter(fifo_position=1)
+        )
+        return {
+            batch.barcode_no: {**ProductSerializer(batch).data, 'total_stock': batch.total_stock or 0}
+            for batch in heads
+        }
+
+    def cached(self, barcodes):
+        now = time.monotonic()
+        with self.lock:
+            generation = self.generation
+            found = {}
+            for barcode in barcodes:
+                entry = self.entries.get(barcode)
+                if entry is None:
+                    continue
+                if entry[0] <= now:
+                    del self.entries[barcode]
+                    continue
+                self.entries.move_to_end(barcode)
+                found[barcode] = entry[1]
+        return generation, found
+
+    def store(self, generation, looked_up):
+        expires = time.monotonic() + cache_seconds()
+        with self.lock:
+            if generation == self.generation:
+                for barcode, data in looked_up.items():
+                    self.entries[barcode] = (expires, data)
+                    self.entries.move_to_end(barcode)
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+    def forget(self, barcodes, product_names):
+        with self.lock:
+            self.generation += 1
+            for barcode, (_, data) in list(self.entries.items()):
+                if barcode in barcodes or data['product_name'] in product_names:
+                    del self.entries[barcode]
+
+    def resolve_many(self, barcodes):
+        generation, found = self.cached(barcodes)
+        missing = [barcode for barcode in dict.fromkeys(barcodes) if barcode not in found]
+        if missing:
+            looked_up = self.lookup(missing)
+            self.store(generation, looked_up)
+            found.update(looked_up)
+        return {barcode: dict(found[barcode]) for barcode in barcodes if barcode in found}
+
+    async def aresolve_many(self, barcodes):
+        generation, found = self.cached(barcodes)
+        missing = [barcode for barcode in dict.fromkeys(barcodes) if barcode not in found]
+        if missing:
+            # large batches are looked up as concurrent chunks
+            chunks = [(self.lookup, missing[i:i + LOOKUP_CHUNK]) for i in range(0, len(missing), LOOKUP_CHUNK)]
+            looked_up = {}
+            for heads in await gather_reads(*chunks):
+                looked_up.update(heads)
+            self.store(generation, looked_up)
+            found.update(looked_up)
+        return {barcode: dict(found[barcode]) for barcode in barcodes if barcode in found}
+
+    def resolve(self, barcode):
+        return self.resolve_many([barcode]).get(barcode)
+
+    async def aresolve(self, barcode):
+        return (await self.aresolve_many([barcode])).get(barcode)
+
+
+resolver = BarcodeResolver()
+
+
+def forget_batches(batches):
+    # called by every batch write; the resolver drops what they touched once they commit
+    barcodes = {batch.barcode_no for batch in batches}
+    product_names = {batch.product_name for batch in batches}
+    if barcodes:
+        transaction.on_commit(lambda: resolver.forget(barcodes, product_names))
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from asgiref.sync import ThreadSensitiveContext
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .barcodes import resolver
+from .cache import summary_cache
+from .models import Product, ProductStock, Distrib, Notification, InventoryVersion
+
+BATCH_SIZE = 2000
+
+
+# Seeds products x batches x distributions and times the inventory hot paths through the
+# same views and model methods the API uses. Run it via `manage.py benchmark_inventory`,
+# which does all of this inside a throwaway test database.
+def seed(products, batches, distributions, rng):
+    Distrib.objects.all().delete()
+    Notification.objects.all().delete()
+    Product.all_objects.all().delete()
+    ProductStock.objects.all().delete()
+
+    start = date.today() + timedelta(days=60)
+    rows = [
+        Product(
+            product_id=f"BM{p}-{b}",
+            barcode_no=f"{p:013d}",
+            product_name=f"Bench {p}",
+            product_detail='benchmark batch',
+            product_qty=rng.randint(600, Product.MAX_STOCK),
+            product_expiry=start + timedelta(days=b * 7),
+        )
+        for p in range(products) for b in range(batches)
+    ]
+    Product.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    Distrib.objects.bulk_create(
+        [Distrib(product=rng.choice(rows), distrib_quantity=rng.randint(1, 20)) for _ in range(products * distributions)],
+        batch_size=BATCH_SIZE,
+    )
+    ProductStock.objects.rebuild()
+    InventoryVersion.objects.bump()
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def measure(func, repeat):
+    timings = []
+    queries = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'queries': max(queries),
+    }
+
+
+def scenarios(products, rng):
+    client = APIClient()
+    client.force_authenticate(get_user_model()(username='benchmark'))
+    names = [f"Bench {p}" for p in range(products)]
+    created = []
+
+    def get(url):
+        def call():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+        return call
+
+    def create_distribution():
+        head = Product.objects.filter(product_name=rng.choice(names), product_qty__gt=0).order_by('product_expiry').first()
+        created.append(Distrib.objects.create(product=head, distrib_quantity=1))
+
+    def edit_distribution():
+        distrib = rng.choice(created)
+        distrib.distrib_quantity = 3 - distrib.distrib_quantity if distrib.distrib_quantity <= 2 else 1
+        distrib.save()
+
+    def summary(url):
+        def call():
+            summary_cache().clear()
+            get(url)()
+        return call
+
+    def barcode_lookup():
+        resolver.entries.clear()
+        get(reverse('product-by-barcode', args=[f"{rng.randrange(products):013d}"]))()
+
+    return [
+        ('distribution_create', create_distribution),
+        ('distribution_edit', edit_distribution),
+        ('grouped_product_summary', summary(reverse('grouped-products'))),
+        ('inventory_distribution_summary', summary(reverse('inventory-summary'))),
+        ('barcode_lookup', barcode_lookup),
+        ('product_list', get(reverse('product-list'))),
+        ('product_list_page', get(reverse('product-list') + '?page_size=100')),
+        ('distrib_list', get(reverse('distrib-list'))),
+        ('distrib_list_page', get(reverse('distrib-list') + '?page_size=100')),
+    ]
+
+
+def load_stats(timings, elapsed):
+    timings = sorted(timings)
+    return {
+        'requests_per_sec': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+    }
+
+
+def load_wsgi(path, requests, concurrency, token):
+    # thread-per-request, as under a threaded WSGI server
+    def worker(count):
+        client = Client()
+        client.cookies['access_token'] = token
+        timings = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                response = client.get(path)
+                timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, (path, response.status_code)
+        finally:
+            connections.close_all()
+        return timings
+
+    counts = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        timings = [t for result in pool.map(worker, counts) for t in result]
+    return load_stats(timings, time.perf_counter() - started)
+
+
+def load_asgi(path, requests, concurrency, token):
+    # one event loop; each request gets its own sync thread like ASGIHandler gives it
+    async def drive():
+        client = AsyncClient()
+        client.cookies['access_token'] = token
+        slots = asyncio.Semaphore(concurrency)
+        timings = []
+
+        async def one():
+            async with slots, ThreadSensitiveContext():
+                started = time.perf_counter()
+                response = await client.get(path)
+                timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, (path, response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return load_stats(timings, time.perf_counter() - started)
+
+    return asyncio.run(drive())
+
+
+LOAD_ENDPOINTS = [
+    ('product_list', 'product-list', 'async-product-list'),
+    ('distrib_list', 'distrib-list', 'async-distrib-list'),
+    ('grouped_product_summary', 'grouped-products', 'async-grouped-products'),
+    ('inventory_distribution_summary', 'inventory-summary', 'async-inventory-summary'),
+]
+
+
+def compare_servers(requests, concurrency):
+    # Same endpoints through the WSGI handler (DRF views) and the ASGI handler (async views),
+    # in process. For deployment numbers run both project.wsgi and project.asgi under real
+    # servers and a load generator; this catches relative regressions.
+    user, _ = get_user_model().objects.get_or_create(username='benchmark')
+    token = str(AccessToken.for_user(user))
+    results = {}
+    for name, sync_url, async_url in LOAD_ENDPOINTS:
+        results[name] = {
+            'wsgi': load_wsgi(reverse(sync_url), requests, concurrency, token),
+            'asgi': load_asgi(reverse(async_url), requests, concurrency, token),
+        }
+    return results
+
+
+def run(products, batches, distributions, scales, repeat, seed_value=0, load_requests=0, concurrency=1):
+    rng = random.Random(seed_value)
+    report = {
+        'meta': {
+            'vendor': connection.vendor,
+            'products': products,
+            'batches': batches,
+            'distributions': distributions,
+            'repeat': repeat,
+            'load_requests': load_requests,
+            'concurrency': concurrency,
+        },
+        'results': {},
+    }
+    for scale in scales:
+        scaled = products * scale
+        seed(scaled, batches, distributions, rng)
+        results = report['results'][f"x{scale}"] = {
+            'rows': {
+                'batches': scaled * batches,
+                'distributions': scaled * distributions,
+            },
+        }
+        for name, func in scenarios(scaled, rng):
+            results[name] = measure(func, repeat)
+        if load_requests:
+            results['load'] = compare_servers(load_requests, concurrency)
+    return report
+
+
+def compare(report, baseline, tolerance):
+    # Regressions: scenarios whose median grew by more than `tolerance` (0.2 = 20%) or ran more queries
+    regressions = []
+    for scale, results in report['results'].items():
+        for name, result in results.items():
+            previous = baseline.get('results', {}).get(scale, {}).get(name)
+            if name == 'load' and previous:
+                regressions.extend(compare_load(scale, result, previous, tolerance))
+                continue
+            if not previous or 'median_ms' not in result:
+                continue
+            if result['median_ms'] > previous['median_ms'] * (1 + tolerance):
+                regressions.append(f"{scale} {name}: {previous['median_ms']}ms -> {result['median_ms']}ms")
+            if result['queries'] > previous['queries']:
+                regressions.append(f"{scale} {name}: {previous['queries']} -> {result['queries']} queries")
+    return regressions
+
+
+def compare_load(scale, result, previous, tolerance):
+    regressions = []
+    for endpoint, servers in result.items():
+        for server, stats in servers.items():
+            before = previous.get(endpoint, {}).get(server)
+            if before and stats['requests_per_sec'] < before['requests_per_sec'] / (1 + tolerance):
+                regressions.append(
+                    f"{scale} {server} {endpoint}: {before['requests_per_sec']} -> {stats['requests_per_sec']} req/s"
+                )
+    return regressions
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
@@ -0,0 +1,112 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import InventoryVersion
+
+STAT_KEYS = ('hits', 'misses', 'not_modified')
+
+
+def summary_cache():
+    return caches[getattr(settings, 'SUMMARY_CACHE_ALIAS', 'default')]
+
+
+def count(stat):
+    cache = summary_cache()
+    key = f'summary-stats:{stat}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def cache_stats():
+    cache = summary_cache()
+    stats = {stat: cache.get(f'summary-stats:{stat}', 0) for stat in STAT_KEYS}
+    stats['inventory_version'] = InventoryVersion.objects.current()
+    return stats
+
+
+async def acount(stat):
+    cache = summary_cache()
+    key = f'summary-stats:{stat}'
+    if not await cache.aadd(key, 1, timeout=None):
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            await cache.aset(key, 1, timeout=None)
+
+
+def cache_keys(name, version, request):
+    query = hashlib.md5(request.get_full_path().encode()).hexdigest()[:12]
+    return f'"{name}-{version}-{query}"', f'summary:{name}:{version}:{query}'
+
+
+def versioned_response(name, daily=False):
+    # Cache a GET view's data under the current inventory version and answer
+    # If-None-Match with 304. Any Product/Distrib write bumps the version.
+    # daily=True also rolls the key over at midnight, for date-relative counts.
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            version = InventoryVersion.objects.current()
+            if daily:
+                version = f'{version}-{timezone.now().date().isoformat()}'
+            etag, key = cache_keys(name, version, request)
+
+            if etag in request.headers.get('If-None-Match', ''):
+                count('not_modified')
+                response = Response(status=304)
+                response['ETag'] = etag
+                return response
+
+            cache = summary_cache()
+            data = cache.get(key)
+            if data is None:
+                count('misses')
+                data = view(request, *args, **kwargs).data
+                cache.set(key, data)
+            else:
+                count('hits')
+
+            response = Response(data)
+            response['ETag'] = etag
+            return response
+        return wrapped
+    return decorator
+
+
+def aversioned_response(name):
+    # versioned_response for async views that return plain data
+    def decorator(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            version = await InventoryVersion.objects.acurrent()
+            etag, key = cache_keys(name, version, request)
+
+            if etag in request.headers.get('If-None-Match', ''):
+                await acount('not_modified')
+                response = HttpResponse(status=304)
+                response['ETag'] = etag
+                return response
+
+            cache = summary_cache()
+            data = await cache.aget(key)
+            if data is None:
+                await acount('misses')
+                data = await view(request, *args, **kwargs)
+                await cache.aset(key, data)
+            else:
+                await acount('hits')
+
+            response = JsonResponse(data, safe=False)
+            response['ETag'] = etag
+            return response
+        return wrapped
+    return decorator
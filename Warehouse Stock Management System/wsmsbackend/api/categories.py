@@ -0,0 +1,63 @@
+FOOD = 'food'
+BODY_CARE = 'body_care'
+FABRIC_ENHANCERS = 'fabric_enhancers'
+HOME_CARE = 'home_care'
+OTHER = 'other'
+
+CATEGORY_CHOICES = [
+    (FOOD, 'Food and Other Consumables'),
+    (BODY_CARE, 'Body Care'),
+    (FABRIC_ENHANCERS, 'Fabric Enhancers'),
+    (HOME_CARE, 'Home Care'),
+    (OTHER, 'Other'),
+]
+
+# product names per category, as the inventory page grouped them
+CATEGORY_PRODUCTS = {
+    FOOD: [
+        "Knorr Beef Cube",
+        "Knorr Pork Cube",
+        "Knorr Chicken Cube",
+        "Knorr Sinigang Sampaloc",
+        "Knorr Sinigang Gabi",
+        "Knorr Sinigang Miso",
+        "Royal Pasta Elbow Macaroni",
+        "Royal Pasta Long Spaghetti",
+        "Energen Vanilla",
+        "555 New Sardines in Tomato Sauce",
+        "Lady's Choice Chicken Spread",
+        "Lady's Choice Ham Spread",
+        "BestFoods Peanut Butter",
+        "Lipton Ice Tea",
+    ],
+    BODY_CARE: [
+        "Ponds Eye Cream",
+        "Ponds Serum",
+        "Ponds Facial Mist Cleanser",
+        "Ponds UV Cream",
+        "Rexona Men's Deodorant",
+        "Rexona Women's Deodorant",
+        "Dove Deodorant",
+        "Dove Beauty Bar",
+        "Dove Body Lotion",
+        "Sunsilk Shampoo",
+        "Creamsilk Conditioner",
+        "Close up Toothpaste",
+        "Pepsodent Toothpaste",
+    ],
+    FABRIC_ENHANCERS: [
+        "Surf Fabcon Morning Fresh",
+        "Surf Fabcon Blossom Fresh",
+        "Surf Powder Lavender",
+    ],
+    HOME_CARE: [
+        "Domex Classic",
+        "Domex Lemon Explosion",
+    ],
+}
+
+PRODUCT_CATEGORIES = {name: category for category, names in CATEGORY_PRODUCTS.items() for name in names}
+
+
+def classify(product_name):
+    return PRODUCT_CATEGORIES.get(product_name, OTHER)
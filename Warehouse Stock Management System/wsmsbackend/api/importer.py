@@ -0,0 +1,132 @@
+import csv
+import json
+from itertools import islice
+
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
+from .barcodes import forget_batches
+from .categories import classify
+from .ledger import record
+from .models import Product, ProductStock, InventoryVersion, inventory_write
+from .serializers import ProductSerializer
+
+IMPORT_FIELDS = ['product_id', 'barcode_no', 'product_name', 'product_detail', 'product_qty', 'product_expiry']
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+def read_lines(stream):
+    return (line.decode('utf-8-sig') for line in iter(stream.readline, b''))
+
+
+def read_csv(stream):
+    return csv.DictReader(read_lines(stream))
+
+
+def read_ndjson(stream):
+    for line in read_lines(stream):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {'__invalid__': "Line is not a JSON object."}
+
+
+def import_fields():
+    # ProductSerializer's field rules, minus the per-row uniqueness query which is done per chunk
+    fields = {name: ProductSerializer().fields[name] for name in IMPORT_FIELDS}
+    fields['product_id'].validators = [
+        validator for validator in fields['product_id'].validators
+        if not isinstance(validator, UniqueValidator)
+    ]
+    return fields
+
+
+def validate_row(fields, row):
+    if '__invalid__' in row:
+        return None, {'non_field_errors': [row['__invalid__']]}
+    values, errors = {}, {}
+    for name, field in fields.items():
+        try:
+            values[name] = field.run_validation(row.get(name, serializers.empty))
+        except serializers.ValidationError as e:
+            errors[name] = e.detail
+    return values, errors
+
+
+def split_batches(values):
+    # Quantities over MAX_STOCK become several batches: ID, ID-2, ID-3, ...
+    qty = values['product_qty']
+    parts = [Product.MAX_STOCK] * (qty // Product.MAX_STOCK)
+    if qty % Product.MAX_STOCK or not parts:
+        parts.append(qty % Product.MAX_STOCK)
+    category = classify(values['product_name'])
+    for n, part in enumerate(parts, start=1):
+        product_id = values['product_id'] if n == 1 else f"{values['product_id']}-{n}"
+        yield Product(**{**values, 'product_id': product_id, 'product_qty': part, 'category': category})
+
+
+def import_products(rows, chunk_size=CHUNK_SIZE):
+    fields = import_fields()
+    summary = {'received': 0, 'inserted_rows': 0, 'inserted_batches': 0, 'split_rows': 0, 'rejected': 0, 'errors': []}
+
+    def reject(line, errors):
+        summary['rejected'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line, 'errors': errors})
+
+    rows = iter(rows)
+    line = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        pending = []
+        for row in chunk:
+            line += 1
+            summary['received'] += 1
+            values, errors = validate_row(fields, row)
+            if errors:
+                reject(line, errors)
+            else:
+                pending.append((line, list(split_batches(values))))
+
+        ids = [batch.product_id for _, batches in pending for batch in batches]
+        taken = set(Product.all_objects.filter(product_id__in=ids).values_list('product_id', flat=True))
+
+        batches = []
+        for row_line, row_batches in pending:
+            row_ids = [batch.product_id for batch in row_batches]
+            if taken.intersection(row_ids):
+                reject(row_line, {'product_id': ["Product with this product id already exists."]})
+                continue
+            taken.update(row_ids)
+            batches.extend(row_batches)
+            summary['inserted_rows'] += 1
+            summary['split_rows'] += len(row_batches) > 1
+
+        if batches:
+            write_chunk(batches)
+            summary['inserted_batches'] += len(batches)
+
+    return summary
+
+
+@inventory_write()
+def write_chunk(batches):
+    Product.objects.bulk_create(batches)
+    record('receive', [(batch, batch.product_qty) for batch in batches])
+    InventoryVersion.objects.bump()
+    forget_batches(batches)
+    changes = {}
+    for batch in batches:
+        change = changes.setdefault(batch.product_name, {'on_hand': 0, 'active_batches': 0})
+        change['on_hand'] += batch.product_qty
+        change['active_batches'] += 1
+    ProductStock.objects.adjust_many(changes)
+    ProductStock.objects.refresh_expiry_many(list(changes))
@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import StockMovement, StockSnapshot
+from . import rollups
+
+# Snapshots stop this far behind now, so movements in still-open transactions
+# (stamped before they commit) are never skipped by a snapshot and its replay.
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+
+def movements(kind, changes, distrib=None):
+    # changes: (batch, signed on-hand delta) pairs
+    now = timezone.now()
+    return [
+        StockMovement(
+            product_id=batch.product_id,
+            product_name=batch.product_name,
+            kind=kind,
+            quantity=quantity,
+            distrib=distrib,
+            created_at=now,
+        )
+        for batch, quantity in changes
+    ]
+
+
+def allocation_movements(allocations, distrib=None):
+    # FIFO draws, plus an archive marker for each batch the draw emptied
+    drawn = movements('distribute', [(batch, -taken) for batch, taken in allocations], distrib)
+    emptied = {batch.product_id: batch for batch, _ in allocations if batch.is_archived}
+    return drawn + movements('archive', [(batch, 0) for batch in emptied.values()], distrib)
+
+
+def transfer_movements(batch, old_name, quantity):
+    # out of the old product name, into the batch's current one
+    moved_out, moved_in = movements('transfer', [(batch, -quantity), (batch, quantity)])
+    moved_out.product_name = old_name
+    return [moved_out, moved_in]
+
+
+def write(rows):
+    # every ledger insert goes through here so the hourly/daily rollups stay in step
+    rows = StockMovement.objects.bulk_create(rows)
+    rollups.add(rows)
+    return rows
+
+
+def record(kind, changes, distrib=None):
+    return write(movements(kind, changes, distrib))
+
+
+def take_snapshot(at=None):
+    # previous snapshot + the movements since, so the ledger is only read back to the last one
+    at = at or timezone.now() - SNAPSHOT_LAG
+    previous = StockSnapshot.objects.filter(taken_at__lte=at).aggregate(latest=Max('taken_at'))['latest']
+    if previous == at:
+        return 0
+
+    balances = {}
+    replay = StockMovement.objects.filter(created_at__lte=at)
+    if previous is not None:
+        for row in StockSnapshot.objects.filter(taken_at=previous).values('product_id', 'product_name', 'on_hand'):
+            balances[row['product_id']] = [row['product_name'], row['on_hand']]
+        replay = replay.filter(created_at__gt=previous)
+
+    # a batch's balance is kept under the name on its latest movement, so a rename moves all of it
+    deltas = (
+        replay.values('product_id', 'product_name')
+        .annotate(delta=Sum('quantity'), latest=Max('movement_id'))
+        .order_by('latest')
+    )
+    for row in deltas:
+        balance = balances.setdefault(row['product_id'], [row['product_name'], 0])
+        balance[0] = row['product_name']
+        balance[1] += row['delta']
+
+    rows = [
+        StockSnapshot(taken_at=at, product_id=product_id, product_name=name, on_hand=on_hand)
+        for product_id, (name, on_hand) in balances.items() if on_hand
+    ]
+    StockSnapshot.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def on_hand_at(at, product_name=None):
+    # latest snapshot at or before `at`, plus the movements between it and `at`
+    snapshots = StockSnapshot.objects.filter(taken_at__lte=at)
+    replay = StockMovement.objects.filter(created_at__lte=at)
+    if product_name is not None:
+        snapshots = snapshots.filter(product_name=product_name)
+        replay = replay.filter(product_name=product_name)
+
+    on_hand = 0
+    taken_at = snapshots.aggregate(latest=Max('taken_at'))['latest']
+    if taken_at is not None:
+        on_hand = snapshots.filter(taken_at=taken_at).aggregate(total=Sum('on_hand'))['total'] or 0
+        replay = replay.filter(created_at__gt=taken_at)
+    return on_hand + (replay.aggregate(total=Sum('quantity'))['total'] or 0)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly and daily stock rollups from the movement ledger and pre-ledger distributions."
+
+    def handle(self, *args, **options):
+        rows = backfill()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rollup rows."))
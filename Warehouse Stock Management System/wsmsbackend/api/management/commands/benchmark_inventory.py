@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api import benchmark
+
+
+class Command(BaseCommand):
+    help = "Time distribution writes, summaries, barcode lookups and list endpoints on a seeded throwaway database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100, help="Distinct products at scale 1.")
+        parser.add_argument('--batches', type=int, default=5, help="Batches per product.")
+        parser.add_argument('--distributions', type=int, default=10, help="Distribution records per product.")
+        parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help="Multipliers applied to --products.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per scenario.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--load-requests', type=int, default=0,
+            help="Also drive each list/summary endpoint this many times through WSGI and ASGI and compare."
+        )
+        parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight during the load run.")
+        parser.add_argument('--output', help="Write the JSON report here.")
+        parser.add_argument('--baseline', help="Fail if this report regresses against the given JSON report.")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown over the baseline, 0.2 = 20%%.")
+        parser.add_argument('--keepdb', action='store_true', help="Reuse the test database if it exists.")
+
+    def handle(self, *args, **options):
+        baseline = benchmark.load(options['baseline']) if options['baseline'] else None
+
+        # Seed into test_<NAME> (or an in-memory SQLite db), never the configured database
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            report = benchmark.run(
+                options['products'], options['batches'], options['distributions'],
+                options['scales'], options['repeat'], options['seed'],
+                options['load_requests'], options['concurrency'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if baseline is not None:
+            regressions = benchmark.compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Benchmark regressed:\n" + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from api.models import Notification
+
+
+class Command(BaseCommand):
+    help = "Delete old notifications and collapse older repeats to the latest per batch and type."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90),
+            help="Delete notifications not raised again within this many days."
+        )
+        parser.add_argument(
+            '--compact-after', type=int, default=7,
+            help="Keep only the latest notification per batch and type once older than this many days."
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired, _ = Notification.objects.filter(updated_at__lt=now - timedelta(days=options['days'])).delete()
+
+        older = Notification.objects.filter(updated_at__lt=now - timedelta(days=options['compact_after']))
+        latest = set(
+            Notification.objects
+            .values('product', 'notif_type')
+            .annotate(latest=Max('notif_id'))
+            .values_list('latest', flat=True)
+        )
+        stale = [notif_id for notif_id in older.values_list('notif_id', flat=True).iterator() if notif_id not in latest]
+
+        compacted = 0
+        for i in range(0, len(stale), options['batch_size']):
+            deleted, _ = Notification.objects.filter(notif_id__in=stale[i:i + options['batch_size']]).delete()
+            compacted += deleted
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {expired} expired notifications and compacted {compacted} repeats."
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.alerts import scan_inventory_alerts
+from api.reorder import HISTORY_DAYS, compute_reorder_points
+
+
+class Command(BaseCommand):
+    help = "Recompute per-product reorder points from daily distribution history, then rescan low-stock alerts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=HISTORY_DAYS, help="Days of history to model demand from.")
+        parser.add_argument('--no-scan', action='store_true', help="Skip the full alert scan against the new points.")
+
+    def handle(self, *args, **options):
+        result = compute_reorder_points(options['history_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Reorder points for {result['with_reorder_point']} of {result['products']} products."
+        ))
+        if not options['no_scan']:
+            # thresholds moved without any batch changing, so the incremental scan would miss them
+            counts = scan_inventory_alerts(full=True)
+            self.stdout.write(self.style.SUCCESS(f"Flagged {counts['low_stock']} low-stock batches."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.models import ProductStock
+
+
+class Command(BaseCommand):
+    help = "Recompute tbl_product_stock from tbl_product and tbl_distrib."
+
+    def handle(self, *args, **options):
+        count = ProductStock.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stock totals for {count} products."))
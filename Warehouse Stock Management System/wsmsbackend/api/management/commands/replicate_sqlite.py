@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.routers import replica_alias, replicate_sqlite
+
+
+class Command(BaseCommand):
+    help = "Local testing: copy the SQLite primary onto the SQLite replica every --delay seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delay', type=float, default=2.0, help="Artificial replication lag, in seconds.")
+        parser.add_argument('--once', action='store_true', help="Copy once and exit.")
+
+    def handle(self, *args, **options):
+        replica = replica_alias()
+        if replica is None:
+            raise CommandError("No replica configured; set REPLICA_DATABASE_ALIAS and add it to DATABASES.")
+        for alias in ('default', replica):
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f"'{alias}' is not SQLite; real replicas replicate themselves.")
+
+        while True:
+            replicate_sqlite('default', replica)
+            self.stdout.write(f"Replicated default -> {replica}")
+            if options['once']:
+                return
+            time.sleep(options['delay'])
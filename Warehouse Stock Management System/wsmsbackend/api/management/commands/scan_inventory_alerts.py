@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.alerts import scan_inventory_alerts
+
+
+class Command(BaseCommand):
+    help = "Raise expiring-soon and low-stock notifications for batches that changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Ignore the watermark and scan every open batch.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        counts = scan_inventory_alerts(full=options['full'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Flagged {counts['expiring_soon']} expiring and {counts['low_stock']} low-stock batches."
+        ))
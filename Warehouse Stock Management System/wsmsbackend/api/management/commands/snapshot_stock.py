@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime
+
+from api.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Snapshot on-hand stock per batch from the movement ledger, so point-in-time queries replay only since the last one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--at', help="ISO timestamp to snapshot at (default: now minus a short lag).")
+
+    def handle(self, *args, **options):
+        at = parse_datetime(options['at']) if options['at'] else None
+        rows = take_snapshot(at)
+        self.stdout.write(self.style.SUCCESS(f"Snapshotted {rows} batches."))
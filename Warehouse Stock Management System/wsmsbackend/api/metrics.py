@@ -0,0 +1,97 @@
+import threading
+from bisect import bisect_left
+
+# Minimal in-process Prometheus registry. Values are per worker process;
+# scrape every worker (or run a single worker) to get the full picture.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in labels)
+    return '{' + pairs + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{format_labels(key)} {value}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        with self.lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{format_labels(key + (("le", bound),))} {cumulative}'
+            yield f'{self.name}_sum{format_labels(key)} {total}'
+            yield f'{self.name}_count{format_labels(key)} {cumulative}'
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help_text}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+# requests, keyed by resolved URL name
+REQUESTS = register(Counter('wsms_http_requests_total', 'HTTP requests by view, method and status.'))
+REQUEST_SECONDS = register(Histogram('wsms_http_request_duration_seconds', 'Wall time per request.'))
+REQUEST_QUERIES = register(Histogram('wsms_http_request_db_queries', 'Database queries per request.', COUNT_BUCKETS))
+REQUEST_DB_SECONDS = register(Histogram('wsms_http_request_db_duration_seconds', 'Database time per request.'))
+RESPONSE_BYTES = register(Histogram('wsms_http_response_size_bytes', 'Response body size.', SIZE_BUCKETS))
+
+# FIFO allocation path
+FIFO_ALLOCATIONS = register(Counter('wsms_fifo_allocations_total', 'FIFO allocations by entry point.'))
+FIFO_SECONDS = register(Histogram('wsms_fifo_allocation_duration_seconds', 'Time spent allocating stock FIFO.'))
+FIFO_BATCHES = register(Histogram('wsms_fifo_batches_touched', 'Batches written per FIFO allocation.', COUNT_BUCKETS))
+FIFO_NOTIFICATIONS = register(Counter('wsms_fifo_notifications_total', 'Notifications raised by FIFO allocation.'))
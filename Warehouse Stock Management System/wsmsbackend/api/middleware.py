@@ -0,0 +1,125 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from . import metrics
+
+# Tracker of the request being served. Context variables follow the request into
+# sync_to_async threads, so queries an async view runs on other threads still count.
+current_tracker = ContextVar('current_tracker', default=None)
+
+
+class QueryTracker:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.count += 1
+            self.seconds += seconds
+
+
+def track_query(execute, sql, params, many, context):
+    tracker = current_tracker.get()
+    if tracker is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tracker.add(time.perf_counter() - start)
+
+
+def install_query_tracker(sender, connection, **kwargs):
+    # connection_created handler: every connection, on any thread, reports to current_tracker
+    if track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_query)
+
+
+# Per-request wall time, DB query count/time and response size, labelled with the
+# resolved URL name. Emits a Server-Timing header and feeds the /metrics histograms.
+# Sync or async depending on the rest of the chain, so ASGI requests stay async.
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        tracker = QueryTracker()
+        token = current_tracker.set(tracker)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_tracker.reset(token)
+        return self.record(request, response, tracker, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        tracker = QueryTracker()
+        token = current_tracker.set(tracker)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_tracker.reset(token)
+        return self.record(request, response, tracker, time.perf_counter() - start)
+
+    def record(self, request, response, tracker, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        size = 0 if response.streaming else len(response.content)
+
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_SECONDS.observe(elapsed, view=view)
+        metrics.REQUEST_QUERIES.observe(tracker.count, view=view)
+        metrics.REQUEST_DB_SECONDS.observe(tracker.seconds, view=view)
+        if not response.streaming:
+            metrics.RESPONSE_BYTES.observe(size, view=view)
+
+        response['Server-Timing'] = (
+            f'total;dur={elapsed * 1000:.1f}, '
+            f'db;dur={tracker.seconds * 1000:.1f};desc="{tracker.count} queries"'
+        )
+        return response
+
+
+# Every notification a request commits, across all of its transactions, is written with
+# one upsert once the response is ready.
+class NotificationBatchMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        from .models import Notification
+        with Notification.objects.batch():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        from .models import Notification, notification_batch
+        pending = []
+        token = notification_batch.set(pending)
+        try:
+            return await self.get_response(request)
+        finally:
+            notification_batch.reset(token)
+            if pending:
+                await sync_to_async(Notification.objects.upsert)(pending)
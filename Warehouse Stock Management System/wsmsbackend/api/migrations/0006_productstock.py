@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:18
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Sum
+
+
+def backfill_stock_totals(apps, schema_editor):
+    Product = apps.get_model('api', 'Product')
+    Distrib = apps.get_model('api', 'Distrib')
+    ProductStock = apps.get_model('api', 'ProductStock')
+
+    totals = {
+        name: ProductStock(product_name=name)
+        for name in Product.objects.values_list('product_name', flat=True).distinct()
+    }
+    batches = (
+        Product.objects
+        .filter(is_archived=False)
+        .values('product_name')
+        .annotate(
+            on_hand=Sum('product_qty'),
+            active_batches=Count('product_id'),
+            earliest_expiry=Min('product_expiry', filter=Q(product_qty__gt=0)),
+        )
+    )
+    for row in batches:
+        stock = totals[row['product_name']]
+        stock.on_hand = row['on_hand'] or 0
+        stock.active_batches = row['active_batches']
+        stock.earliest_expiry = row['earliest_expiry']
+
+    distributed = (
+        Distrib.objects
+        .filter(is_active=True)
+        .values('product__product_name')
+        .annotate(total=Sum('distrib_quantity'))
+    )
+    for row in distributed:
+        totals[row['product__product_name']].distributed = row['total']
+
+    ProductStock.objects.bulk_create(totals.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_alter_product_barcode_no'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStock',
+            fields=[
+                ('product_name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('on_hand', models.IntegerField(default=0)),
+                ('distributed', models.IntegerField(default=0)),
+                ('active_batches', models.IntegerField(default=0)),
+                ('earliest_expiry', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'tbl_product_stock',
+            },
+        ),
+        migrations.RunPython(backfill_stock_totals, migrations.RunPython.noop),
+    ]
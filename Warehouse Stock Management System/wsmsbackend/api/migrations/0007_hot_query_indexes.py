@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_productstock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='distrib',
+            index=models.Index(fields=['is_active', 'product'], name='distrib_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_name', 'is_archived', 'product_expiry'], name='product_fifo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['barcode_no'], name='product_barcode_idx'),
+        ),
+    ]
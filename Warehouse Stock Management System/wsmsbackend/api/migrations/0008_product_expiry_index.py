@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_expiry', 'product_id'], name='product_expiry_idx'),
+        ),
+    ]
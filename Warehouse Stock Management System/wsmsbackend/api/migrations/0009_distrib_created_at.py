@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_product_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='distrib',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='distrib',
+            index=models.Index(fields=['created_at'], name='distrib_created_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:55
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_windows(apps, schema_editor):
+    Notification = apps.get_model('api', 'Notification')
+    window = int(getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', timedelta(hours=24)).total_seconds())
+
+    kept = set()
+    updates = []
+    duplicates = []
+    rows = Notification.objects.order_by('-created_at', '-notif_id').values_list(
+        'notif_id', 'product_id', 'notif_type', 'created_at'
+    )
+    for notif_id, product_id, notif_type, created_at in rows.iterator(chunk_size=1000):
+        start = datetime.fromtimestamp(int(created_at.timestamp()) // window * window, tz=dt_timezone.utc)
+        key = (product_id, notif_type, start)
+        if key in kept:
+            duplicates.append(notif_id)
+            continue
+        kept.add(key)
+        updates.append(Notification(notif_id=notif_id, window_start=start, updated_at=created_at))
+
+    # one CASE UPDATE / DELETE per 1000 rows instead of a statement per notification
+    Notification.objects.bulk_update(updates, ['window_start', 'updated_at'], batch_size=1000)
+    for i in range(0, len(duplicates), 1000):
+        Notification.objects.filter(notif_id__in=duplicates[i:i + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_distrib_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='window_start',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(assign_windows, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='notification',
+            name='window_start',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('product', 'notif_type', 'window_start'), name='notification_window_unique'),
+        ),
+    ]
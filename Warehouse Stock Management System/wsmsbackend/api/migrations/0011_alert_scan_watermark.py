@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_notification_coalescing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertScanState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('scanned_at', models.DateTimeField()),
+                ('expiry_horizon', models.DateField()),
+            ],
+            options={
+                'db_table': 'tbl_alert_scan_state',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_alert_scan_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'tbl_inventory_version',
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_inventory_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_barcode_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['barcode_no', 'is_archived', 'product_expiry'], name='product_barcode_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+# Frozen copy of api.categories at the time of this migration, so later edits
+# to the live rules don't change what this migration did.
+CATEGORY_PRODUCTS = {
+    'food': [
+        "Knorr Beef Cube", "Knorr Pork Cube", "Knorr Chicken Cube",
+        "Knorr Sinigang Sampaloc", "Knorr Sinigang Gabi", "Knorr Sinigang Miso",
+        "Royal Pasta Elbow Macaroni", "Royal Pasta Long Spaghetti", "Energen Vanilla",
+        "555 New Sardines in Tomato Sauce", "Lady's Choice Chicken Spread", "Lady's Choice Ham Spread",
+        "BestFoods Peanut Butter", "Lipton Ice Tea",
+    ],
+    'body_care': [
+        "Ponds Eye Cream", "Ponds Serum", "Ponds Facial Mist Cleanser", "Ponds UV Cream",
+        "Rexona Men's Deodorant", "Rexona Women's Deodorant", "Dove Deodorant", "Dove Beauty Bar",
+        "Dove Body Lotion", "Sunsilk Shampoo", "Creamsilk Conditioner", "Close up Toothpaste",
+        "Pepsodent Toothpaste",
+    ],
+    'fabric_enhancers': ["Surf Fabcon Morning Fresh", "Surf Fabcon Blossom Fresh", "Surf Powder Lavender"],
+    'home_care': ["Domex Classic", "Domex Lemon Explosion"],
+}
+
+
+def classify_products(apps, schema_editor):
+    Product = apps.get_model('api', 'Product')
+    # queryset update: leaves updated_at alone, so the alert scanner doesn't rescan everything
+    for category, names in CATEGORY_PRODUCTS.items():
+        Product.objects.filter(product_name__in=names).update(category=category)
+
+
+def add_fulltext_index(apps, schema_editor):
+    # MySQL only; other backends fall back to LIKE matching in api.search
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX product_search_ft ON tbl_product (product_name, product_detail)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX product_search_ft ON tbl_product')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_barcode_fifo_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='category',
+            field=models.CharField(choices=[('food', 'Food and Other Consumables'), ('body_care', 'Body Care'), ('fabric_enhancers', 'Fabric Enhancers'), ('home_care', 'Home Care'), ('other', 'Other')], default='other', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'is_archived', 'product_name', 'product_id'], name='product_category_idx'),
+        ),
+        migrations.RunPython(classify_products, migrations.RunPython.noop),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def opening_snapshot(apps, schema_editor):
+    # History starts here: current on-hand per active batch becomes the first snapshot
+    Product = apps.get_model('api', 'Product')
+    StockSnapshot = apps.get_model('api', 'StockSnapshot')
+    now = timezone.now()
+    rows = (
+        Product.objects
+        .filter(is_archived=False, product_qty__gt=0)
+        .values_list('product_id', 'product_name', 'product_qty')
+    )
+    StockSnapshot.objects.bulk_create(
+        [StockSnapshot(taken_at=now, product_id=pid, product_name=name, on_hand=qty) for pid, name, qty in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_product_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('movement_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('product_name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('receive', 'Receive'), ('distribute', 'Distribute'), ('restore', 'Restore'), ('archive', 'Archive'), ('reactivate', 'Reactivate'), ('adjust', 'Adjust')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('distrib', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movements', to='api.distrib')),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movements', to='api.product')),
+            ],
+            options={
+                'db_table': 'tbl_stock_movement',
+                'indexes': [models.Index(fields=['product_name', 'created_at'], name='movement_product_idx'), models.Index(fields=['created_at'], name='movement_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('snapshot_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('taken_at', models.DateTimeField()),
+                ('product_name', models.CharField(max_length=100)),
+                ('on_hand', models.IntegerField()),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='snapshots', to='api.product')),
+            ],
+            options={
+                'db_table': 'tbl_stock_snapshot',
+                'indexes': [models.Index(fields=['product_name', 'taken_at'], name='snapshot_product_idx')],
+                'constraints': [models.UniqueConstraint(fields=('taken_at', 'product'), name='snapshot_batch_unique')],
+            },
+        ),
+        migrations.RunPython(opening_snapshot, migrations.RunPython.noop),
+    ]
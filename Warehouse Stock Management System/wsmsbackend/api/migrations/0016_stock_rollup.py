@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockRollup',
+            fields=[
+                ('rollup_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('bucket', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('period_start', models.DateTimeField()),
+                ('product_name', models.CharField(max_length=100)),
+                ('received', models.IntegerField(default=0)),
+                ('distributed', models.IntegerField(default=0)),
+                ('net_change', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'tbl_stock_rollup',
+                'indexes': [models.Index(fields=['bucket', 'product_name', 'period_start'], name='rollup_product_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'period_start', 'product_name'), name='rollup_period_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_stock_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productstock',
+            name='daily_demand',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productstock',
+            name='days_of_cover',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productstock',
+            name='demand_std',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productstock',
+            name='reorder_computed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productstock',
+            name='reorder_point',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_product_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistribAllocation',
+            fields=[
+                ('allocation_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('distrib', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='api.distrib')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='api.product')),
+            ],
+            options={
+                'db_table': 'tbl_distrib_allocation',
+                'constraints': [models.UniqueConstraint(fields=('distrib', 'product'), name='distrib_allocation_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+# DatabaseCache tables (the 'auth' claims cache) aren't models; create them here so a
+# deploy that only runs migrate has them. Already existing tables are left alone.
+def create_cache_tables(apps, schema_editor):
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_distrib_allocation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_auth_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='distrib',
+            name='pick_list',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
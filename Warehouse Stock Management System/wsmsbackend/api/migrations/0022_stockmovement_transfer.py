@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_distrib_pick_list'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='kind',
+            field=models.CharField(choices=[('receive', 'Receive'), ('distribute', 'Distribute'), ('restore', 'Restore'), ('archive', 'Archive'), ('reactivate', 'Reactivate'), ('adjust', 'Adjust'), ('transfer', 'Transfer')], max_length=20),
+        ),
+    ]
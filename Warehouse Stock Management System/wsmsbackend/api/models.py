@@ -1,10 +1,17 @@
 # Create your models here.
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import models  # type: ignore
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.core.validators import MinValueValidator
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F, Q, Min, Sum, Count, Case, When, Value, OuterRef, Subquery
+
+from .categories import CATEGORY_CHOICES, OTHER
 
 # user
 class User(models.Model):
@@ -27,6 +34,57 @@ class User(models.Model):
         db_table = 'tbl_user'
 
 # notification
+class NotificationManager(models.Manager):
+    def window_start(self, moment):
+        window = int(getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', timedelta(hours=24)).total_seconds())
+        return datetime.fromtimestamp(int(moment.timestamp()) // window * window, tz=dt_timezone.utc)
+
+    def upsert(self, notifications):
+        # One row per (product, notif_type, window); repeats only refresh message/updated_at
+        now = timezone.now()
+        latest = {}
+        for notification in notifications:
+            notification.window_start = self.window_start(now)
+            latest[(notification.product_id, notification.notif_type)] = notification
+        if not latest:
+            return []
+
+        conn = transaction.get_connection()
+        unique_fields = ['product', 'notif_type', 'window_start']
+        return self.bulk_create(
+            latest.values(),
+            update_conflicts=True,
+            unique_fields=unique_fields if conn.features.supports_update_conflicts_with_target else None,
+            update_fields=['message', 'updated_at'],
+        )
+
+    def queue(self, notifications):
+        # Kept until the surrounding transaction commits (dropped if it rolls back). Inside
+        # batch(), which every API request runs in, committed notifications are then written
+        # together when the batch ends; elsewhere straight away.
+        notifications = list(notifications)
+        pending = notification_batch.get()
+        if pending is None:
+            transaction.on_commit(lambda: self.upsert(notifications))
+        else:
+            transaction.on_commit(lambda: pending.extend(notifications))
+
+    @contextmanager
+    def batch(self):
+        # One upsert for every notification committed inside the block
+        pending = []
+        token = notification_batch.set(pending)
+        try:
+            yield pending
+        finally:
+            notification_batch.reset(token)
+            self.upsert(pending)
+
+
+# notifications committed during the current batch(), None outside one
+notification_batch = ContextVar('notification_batch', default=None)
+
+
 class Notification(models.Model):
     NOTIF_TYPE_CHOICES = [
         ('archived', 'Archived'),
@@ -39,9 +97,16 @@ class Notification(models.Model):
     product = models.ForeignKey('Product', on_delete=models.CASCADE)
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    window_start = models.DateTimeField()
+
+    objects = NotificationManager()
 
     class Meta:
         db_table = 'tbl_notification'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'notif_type', 'window_start'], name='notification_window_unique'),
+        ]
 
     def __str__(self):
         return f"{self.get_notif_type_display()} - {self.product.product_name}"
@@ -54,11 +119,36 @@ class ArchivedProductManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset()
 
+@contextmanager
+def inventory_write():
+    # Transaction for a stock write (also usable as a decorator). However many bumps
+    # happen inside, the hot InventoryVersion row is updated once, as the last statement
+    # of the outermost block: every writer locks it last and holds it only until commit,
+    # so writers can't deadlock on it against ProductStock or batch rows.
+    conn = transaction.get_connection()
+    depth = getattr(conn, 'inventory_write_depth', 0)
+    with transaction.atomic():
+        if not depth:
+            conn.inventory_changed = False
+        conn.inventory_write_depth = depth + 1
+        try:
+            yield
+        finally:
+            conn.inventory_write_depth = depth
+        if not depth and conn.inventory_changed:
+            conn.inventory_changed = False
+            InventoryVersion.objects.increment()
+
+# raised when a versioned Product write finds the row changed since it was read
+class VersionConflict(Exception):
+    pass
+
 # product
 class Product(models.Model):
 
     MAX_STOCK = 1000
     LOW_STOCK_THRESHOLD = int(MAX_STOCK * 0.35)  # 35% stock left
+    EXPIRY_WARNING_DAYS = 30
 
     product_id = models.CharField(max_length=255, primary_key=True)
     barcode_no = models.CharField(max_length=20)
@@ -66,15 +156,31 @@ class Product(models.Model):
     product_detail = models.CharField(max_length=255)
     product_qty = models.IntegerField(validators=[MinValueValidator(0)])
     product_expiry = models.DateField()
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default=OTHER)
 
     is_archived = models.BooleanField(default=False)
     archived_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # bumped by every write; edits only land if it still matches what was read
+    version = models.PositiveIntegerField(default=1)
 
     objects = ProductManager()
     all_objects = ArchivedProductManager()
 
     class Meta:
         db_table = "tbl_product"
+        indexes = [
+            # FIFO batch lookups: product_name + is_archived, ordered by expiry
+            models.Index(fields=['product_name', 'is_archived', 'product_expiry'], name='product_fifo_idx'),
+            # barcode -> FIFO head batch
+            models.Index(fields=['barcode_no', 'is_archived', 'product_expiry'], name='product_barcode_idx'),
+            # keyset pagination order for product lists
+            models.Index(fields=['product_expiry', 'product_id'], name='product_expiry_idx'),
+            # alert scanner watermark
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+            # category search pages, ordered by name
+            models.Index(fields=['category', 'is_archived', 'product_name', 'product_id'], name='product_category_idx'),
+        ]
 
     def __str__(self):
         return self.product_name
@@ -85,27 +191,52 @@ class Product(models.Model):
         if self.product_qty > Product.MAX_STOCK:
             raise ValidationError(f"Product quantity cannot exceed {Product.MAX_STOCK}.")
 
-    def is_low_stock(self):
-        return self.product_qty <= Product.LOW_STOCK_THRESHOLD
+    def is_low_stock(self, stock):
+        # stock: the product's ProductStock row (or None), loaded by the caller so that
+        # checks over many batches share one query
+        if stock is None:
+            return low_stock(self.product_qty, None, None)
+        return low_stock(self.product_qty, stock.on_hand, stock.reorder_point)
 
     def is_expiring_soon(self):
-        return timezone.now().date() + timedelta(days=30) >= self.product_expiry
+        return timezone.now().date() + timedelta(days=Product.EXPIRY_WARNING_DAYS) >= self.product_expiry
 
     def notify(self, notif_type, message):
-        Notification.objects.create(
+        Notification.objects.queue([Notification(
             notif_type=notif_type,
             product=self,
             message=message
-        )
-
+        )])
+
+    def save_versioned(self, fields):
+        # UPDATE ... WHERE version = <as read>: no row lock is held between read and write,
+        # and a writer that lost the race gets VersionConflict instead of overwriting.
+        # A queryset update sends no post_save, so the inventory version is bumped here;
+        # callers run inside inventory_write(), which applies it last.
+        self.updated_at = timezone.now()
+        values = {field: getattr(self, field) for field in [*fields, 'updated_at']}
+        updated = Product.all_objects.filter(pk=self.pk, version=self.version).update(version=F('version') + 1, **values)
+        if not updated:
+            raise VersionConflict(f"Product {self.pk} was changed by someone else. Reload it and try again.")
+        self.version += 1
+        InventoryVersion.objects.bump()
+        from .barcodes import forget_batches
+        forget_batches([self])
+
+    @inventory_write()
     def archive(self):
         if self.is_archived:
             raise ValidationError("Product is already archived.")
+        from .ledger import record
         self.is_archived = True
         self.archived_at = timezone.now()
-        self.save()
+        self.save_versioned(['is_archived', 'archived_at'])
+        record('archive', [(self, -self.product_qty)])
+        ProductStock.objects.adjust(self.product_name, on_hand=-self.product_qty, active_batches=-1)
+        ProductStock.objects.refresh_expiry(self.product_name)
         self.notify('archived', f"{self.product_name} has been archived due to zero stock.")
 
+    @inventory_write()
     def reactivate(self, new_qty: int, new_expiry):
         if not self.is_archived:
             raise ValidationError("Product is already active.")
@@ -113,8 +244,296 @@ class Product(models.Model):
         self.archived_at = None
         self.product_qty = new_qty
         self.product_expiry = new_expiry
+        from .ledger import record
         self.clean()
-        self.save()
+        self.save_versioned(['is_archived', 'archived_at', 'product_qty', 'product_expiry'])
+        record('reactivate', [(self, new_qty)])
+        ProductStock.objects.adjust(self.product_name, on_hand=new_qty, active_batches=1)
+        ProductStock.objects.refresh_expiry(self.product_name)
+
+
+class ProductStockManager(models.Manager):
+    def adjust(self, product_name, on_hand=0, distributed=0, active_batches=0, **values):
+        changes = {
+            'on_hand': F('on_hand') + on_hand,
+            'distributed': F('distributed') + distributed,
+            'active_batches': F('active_batches') + active_batches,
+            **values,
+        }
+        if not self.filter(product_name=product_name).update(**changes):
+            self.get_or_create(product_name=product_name)
+            self.filter(product_name=product_name).update(**changes)
+
+    def adjust_many(self, changes):
+        # changes: {product_name: {'on_hand': delta, ..., 'earliest_expiry': date}} applied in one UPDATE
+        if not changes:
+            return
+        self.bulk_create([ProductStock(product_name=name) for name in changes], ignore_conflicts=True)
+        updates = {}
+        for field in ('on_hand', 'distributed', 'active_batches'):
+            deltas = [
+                When(product_name=name, then=Value(change.get(field, 0)))
+                for name, change in changes.items()
+            ]
+            updates[field] = F(field) + Case(*deltas, default=Value(0), output_field=models.IntegerField())
+        expiries = [
+            When(product_name=name, then=Value(change['earliest_expiry']))
+            for name, change in changes.items() if 'earliest_expiry' in change
+        ]
+        if expiries:
+            updates['earliest_expiry'] = Case(*expiries, default=F('earliest_expiry'), output_field=models.DateField())
+        self.filter(product_name__in=changes.keys()).update(**updates)
+
+    def refresh_expiry(self, product_name):
+        earliest = Product.objects.filter(
+            product_name=product_name,
+            product_qty__gt=0
+        ).aggregate(Min('product_expiry'))['product_expiry__min']
+        self.filter(product_name=product_name).update(earliest_expiry=earliest)
+
+    def refresh_expiry_many(self, product_names):
+        earliest = dict(
+            Product.objects
+            .filter(product_name__in=product_names, product_qty__gt=0)
+            .values('product_name')
+            .annotate(earliest=Min('product_expiry'))
+            .values_list('product_name', 'earliest')
+        )
+        self.adjust_many({name: {'earliest_expiry': earliest.get(name)} for name in product_names})
+
+    def for_product(self, product_name):
+        return self.filter(product_name=product_name).first()
+
+    def on_hand(self, product_name):
+        return self.filter(product_name=product_name).values_list('on_hand', flat=True).first() or 0
+
+    @transaction.atomic
+    def rebuild(self):
+        totals = {}
+        batches = (
+            Product.objects
+            .values('product_name')
+            .annotate(
+                on_hand=Sum('product_qty'),
+                active_batches=Count('product_id'),
+                earliest_expiry=Min('product_expiry', filter=models.Q(product_qty__gt=0)),
+            )
+        )
+        for row in batches:
+            totals[row['product_name']] = ProductStock(
+                product_name=row['product_name'],
+                on_hand=row['on_hand'] or 0,
+                active_batches=row['active_batches'],
+                earliest_expiry=row['earliest_expiry'],
+            )
+
+        distributed = (
+            Distrib.objects
+            .filter(is_active=True)
+            .values('product__product_name')
+            .annotate(total=Sum('distrib_quantity'))
+        )
+        for row in distributed:
+            name = row['product__product_name']
+            totals.setdefault(name, ProductStock(product_name=name)).distributed = row['total']
+
+        # names that only have archived batches keep a zeroed row
+        for name in Product.all_objects.values_list('product_name', flat=True).distinct():
+            totals.setdefault(name, ProductStock(product_name=name))
+
+        # the demand model isn't derived from batches; carry it over
+        demand_fields = ['reorder_point', 'daily_demand', 'demand_std', 'days_of_cover', 'reorder_computed_at']
+        for row in self.filter(reorder_computed_at__isnull=False).values('product_name', *demand_fields):
+            if row['product_name'] in totals:
+                for field in demand_fields:
+                    setattr(totals[row['product_name']], field, row[field])
+
+        self.all().delete()
+        self.bulk_create(totals.values())
+        return len(totals)
+
+
+# per product_name stock totals, kept current by the stock write paths
+class ProductStock(models.Model):
+    product_name = models.CharField(max_length=100, primary_key=True)
+    on_hand = models.IntegerField(default=0)
+    distributed = models.IntegerField(default=0)
+    active_batches = models.IntegerField(default=0)
+    earliest_expiry = models.DateField(null=True, blank=True)
+    # demand model from compute_reorder_points; null until it has seen distribution history
+    reorder_point = models.IntegerField(null=True, blank=True)
+    daily_demand = models.FloatField(null=True, blank=True)
+    demand_std = models.FloatField(null=True, blank=True)
+    days_of_cover = models.FloatField(null=True, blank=True)
+    reorder_computed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ProductStockManager()
+
+    class Meta:
+        db_table = 'tbl_product_stock'
+
+    def __str__(self):
+        return f"{self.product_name} ({self.on_hand} on hand)"
+
+
+def with_reorder_levels(batches):
+    stock = ProductStock.objects.filter(product_name=OuterRef('product_name'))
+    return batches.annotate(
+        reorder_point=Subquery(stock.values('reorder_point')),
+        stock_on_hand=Subquery(stock.values('on_hand')),
+    )
+
+
+# Against the product's reorder point once compute_reorder_points has set one: low when
+# total on hand is at or below it. Until then, the batch against the fixed threshold.
+def low_stock(batch_qty, on_hand, reorder_point):
+    if reorder_point is None:
+        return batch_qty <= Product.LOW_STOCK_THRESHOLD
+    return on_hand <= reorder_point
+
+
+# low_stock() in SQL, for batches annotated by with_reorder_levels()
+LOW_STOCK = (
+    Q(reorder_point__isnull=True, product_qty__lte=Product.LOW_STOCK_THRESHOLD)
+    | Q(stock_on_hand__lte=F('reorder_point'))
+)
+
+class InventoryVersionManager(models.Manager):
+    def current(self):
+        return self.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    async def acurrent(self):
+        return await self.filter(pk=1).values_list('version', flat=True).afirst() or 0
+
+    def bump(self):
+        # Inside inventory_write() this only marks the transaction; the block bumps once at
+        # its end. Elsewhere (admin, shell, user edits) the bump is immediate.
+        conn = transaction.get_connection()
+        if getattr(conn, 'inventory_write_depth', 0):
+            conn.inventory_changed = True
+            return
+        self.increment()
+
+    def increment(self):
+        if not self.filter(pk=1).update(version=F('version') + 1):
+            self.get_or_create(pk=1)
+            self.filter(pk=1).update(version=F('version') + 1)
+
+
+# single-row counter bumped by every Product/Distrib write; keys the summary cache.
+# Stock writes go through inventory_write() so the row is updated once, at the end.
+class InventoryVersion(models.Model):
+    version = models.BigIntegerField(default=0)
+
+    objects = InventoryVersionManager()
+
+    class Meta:
+        db_table = 'tbl_inventory_version'
+
+    def __str__(self):
+        return f"inventory v{self.version}"
+
+# last run of scan_inventory_alerts
+class AlertScanState(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    scanned_at = models.DateTimeField()
+    expiry_horizon = models.DateField()
+
+    class Meta:
+        db_table = 'tbl_alert_scan_state'
+
+    def __str__(self):
+        return f"{self.name} @ {self.scanned_at}"
+
+# stock ledger: one row per change to a batch's on-hand quantity. On-hand means
+# product_qty while the batch is active and 0 once archived. Rows are only ever inserted.
+class StockMovement(models.Model):
+    KIND_CHOICES = [
+        ('receive', 'Receive'),
+        ('distribute', 'Distribute'),
+        ('restore', 'Restore'),
+        ('archive', 'Archive'),
+        ('reactivate', 'Reactivate'),
+        ('adjust', 'Adjust'),
+        # a batch renamed: its stock leaves the old product name and joins the new one
+        ('transfer', 'Transfer'),
+    ]
+
+    movement_id = models.BigAutoField(primary_key=True)
+    # no FK constraint: history outlives deleted batches and distributions
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='movements')
+    product_name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    distrib = models.ForeignKey(
+        'Distrib', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='movements'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'tbl_stock_movement'
+        indexes = [
+            # replay after a snapshot, per product or for everything
+            models.Index(fields=['product_name', 'created_at'], name='movement_product_idx'),
+            models.Index(fields=['created_at'], name='movement_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity:+d} {self.product_id}"
+
+
+# on-hand per batch at taken_at, written by the snapshot_stock command; batches with
+# nothing on hand are left out
+class StockSnapshot(models.Model):
+    snapshot_id = models.BigAutoField(primary_key=True)
+    taken_at = models.DateTimeField()
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='snapshots')
+    product_name = models.CharField(max_length=100)
+    on_hand = models.IntegerField()
+
+    class Meta:
+        db_table = 'tbl_stock_snapshot'
+        constraints = [
+            models.UniqueConstraint(fields=['taken_at', 'product'], name='snapshot_batch_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['product_name', 'taken_at'], name='snapshot_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.taken_at}: {self.on_hand}"
+
+
+# per product_name totals for each hour and each day, kept up to date from the stock
+# ledger as movements are written; see rollups.py
+class StockRollup(models.Model):
+    BUCKET_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    rollup_id = models.BigAutoField(primary_key=True)
+    bucket = models.CharField(max_length=10, choices=BUCKET_CHOICES)
+    period_start = models.DateTimeField()
+    product_name = models.CharField(max_length=100)
+    received = models.IntegerField(default=0)
+    # distributed minus restored by distribution edits
+    distributed = models.IntegerField(default=0)
+    # every movement, so a stock level can be carried forward bucket by bucket
+    net_change = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'tbl_stock_rollup'
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'period_start', 'product_name'], name='rollup_period_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket', 'product_name', 'period_start'], name='rollup_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name} {self.bucket} {self.period_start}"
+
 
 # distribution
 class Distrib(models.Model):
@@ -122,129 +541,156 @@ class Distrib(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     distrib_quantity = models.IntegerField(validators=[MinValueValidator(1)])
     is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # shared by the distributions of one pick list; how their ids are found again on
+    # backends that return none from bulk inserts
+    pick_list = models.UUIDField(null=True, blank=True, editable=False, db_index=True)
 
     class Meta:
         db_table = 'tbl_distrib'
+        indexes = [
+            models.Index(fields=['is_active', 'product'], name='distrib_active_idx'),
+            models.Index(fields=['created_at'], name='distrib_created_idx'),
+        ]
 
     def __str__(self):
         return f"Distribution {self.distrib_id} for {self.product.product_name} ({self.distrib_quantity} units)"
 
-    def restore_stock(self, original_quantity):
-        restored = original_quantity
-        product_batches = Product.all_objects.filter(
-            product_name=self.product.product_name,
-            is_archived=False
-        ).order_by('product_expiry')
-
-        for batch in reversed(product_batches):
-            space = Product.MAX_STOCK - batch.product_qty
-            restore_amount = min(space, restored)
-            batch.product_qty += restore_amount
-            batch.clean()
-            batch.save()
-            restored -= restore_amount
-            if restored == 0:
-                break
-
-        if restored > 0:
-            raise ValidationError("Failed to restore full original stock — data may be inconsistent.")
-
-    def deduct_stock_fifo(self, new_quantity):
-        remaining_qty = new_quantity
-        product_batches = Product.objects.filter(
-            product_name=self.product.product_name,
-            product_qty__gt=0,
-            is_archived=False
-        ).order_by('product_expiry')
-
-        for batch in product_batches:
-            if remaining_qty == 0:
-                break
-            deduction = min(batch.product_qty, remaining_qty)
-            batch.product_qty -= deduction
-            batch.clean()
-
-            if batch.product_qty == 0:
-                batch.archive()
-            else:
-                batch.save()
-                if batch.is_low_stock():
-                    batch.notify('low_stock', f"{batch.product_name} is low on stock: {batch.product_qty} left.")
-                if batch.is_expiring_soon():
-                    batch.notify('expiring_soon', f"{batch.product_name} is expiring on {batch.product_expiry}.")
-
-            remaining_qty -= deduction
-
-        if remaining_qty > 0:
-            raise ValidationError("Not enough stock to fulfill the new distribution quantity.")
-
-        self.product = product_batches.first()
-
+    # Stock movements and batch allocations are collected while saving and written once the
+    # distribution has an id. Edits only move the difference: a smaller quantity goes back
+    # to the batches it came from, a larger one allocates just the extra FIFO.
+
+    def restore_stock(self, quantity):
+        from .allocation import return_allocations, restore_lifo
+        from .ledger import movements
+        restored, remaining = return_allocations(self, quantity)
+        if remaining:
+            # distributions from before allocations were recorded, or batches since refilled
+            restored += restore_lifo(self.product.product_name, remaining)
+        self._movements += movements('restore', restored)
+
+    def deduct_stock_fifo(self, quantity):
+        from .allocation import allocate_fifo
+        from .ledger import allocation_movements
+        allocations, head = allocate_fifo(self.product.product_name, quantity)
+        self.product = head
+        self._movements += allocation_movements(allocations)
+        self._allocations += allocations
+
+    @inventory_write()
     def save(self, *args, **kwargs):
+        self._movements = []
+        self._allocations = []
         if self.pk:
-            old = Distrib.objects.get(pk=self.pk)
-            if old.distrib_quantity != self.distrib_quantity:
-                self.restore_stock(old.distrib_quantity)
-                self.deduct_stock_fifo(self.distrib_quantity)
+            old = Distrib.objects.select_for_update().get(pk=self.pk)
+            change = self.distrib_quantity - old.distrib_quantity
+            if change < 0:
+                self.restore_stock(-change)
+            elif change > 0:
+                self.deduct_stock_fifo(change)
+            old_counted = old.distrib_quantity if old.is_active else 0
         else:
-            # FIFO enforcement: check for older batches with stock
-            older_batches = Product.objects.filter(
-                product_name=self.product.product_name,
-                product_expiry__lt=self.product.product_expiry,
-                product_qty__gt=0,
-                is_archived=False
-            ).order_by('product_expiry')
-
-            if older_batches.exists():
-                raise ValidationError(
-                    f"Cannot distribute from this batch (Exp: {self.product.product_expiry}) "
-                    f"while older batch (Exp: {older_batches.first().product_expiry}) still has stock."
-                )
-
-            # Total available check
-            total_stock = Product.objects.filter(
-                product_name=self.product.product_name,
-                product_qty__gt=0,
-                is_archived=False
-            ).aggregate(Sum('product_qty'))['product_qty__sum'] or 0
-
-            if self.distrib_quantity > total_stock:
-                raise ValidationError("Distributed quantity exceeds total available stock for this product.")
-
+            # take_fifo draws oldest expiry first from the locked batches and raises if they
+            # don't cover the quantity
             self.deduct_stock_fifo(self.distrib_quantity)
+            old_counted = 0
 
         super().save(*args, **kwargs)
+        if self._movements:
+            from .ledger import write
+            for movement in self._movements:
+                movement.distrib = self
+            write(self._movements)
+        if self._allocations:
+            DistribAllocation.objects.add(self, self._allocations)
+
+        new_counted = self.distrib_quantity if self.is_active else 0
+        if new_counted != old_counted:
+            ProductStock.objects.adjust(self.product.product_name, distributed=new_counted - old_counted)
+
+
+class DistribAllocationManager(models.Manager):
+    def add(self, distrib, allocations):
+        # allocations: (batch, taken) pairs; repeat draws on a batch add to its row
+        taken = {}
+        for batch, quantity in allocations:
+            taken[batch.product_id] = taken.get(batch.product_id, 0) + quantity
+        existing = list(self.filter(distrib=distrib, product_id__in=taken.keys()))
+        for allocation in existing:
+            allocation.quantity += taken.pop(allocation.product_id)
+        self.bulk_update(existing, ['quantity'])
+        self.bulk_create([
+            DistribAllocation(distrib=distrib, product_id=product_id, quantity=quantity)
+            for product_id, quantity in taken.items()
+        ])
+
+
+# how much of a distribution came from each batch; what an edit hands back
+class DistribAllocation(models.Model):
+    allocation_id = models.BigAutoField(primary_key=True)
+    distrib = models.ForeignKey(Distrib, on_delete=models.CASCADE, related_name='allocations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='allocations')
+    quantity = models.PositiveIntegerField()
+
+    objects = DistribAllocationManager()
 
-def get_inventory_distribution_summary():
-    # Get remaining stock grouped by product_name
-    inventory = (
-        Product.all_objects
-        .filter(is_archived=False)
-        .values('product_name')
-        .annotate(total_stock=Sum('product_qty'))
-    )
+    class Meta:
+        db_table = 'tbl_distrib_allocation'
+        constraints = [
+            models.UniqueConstraint(fields=['distrib', 'product'], name='distrib_allocation_unique'),
+        ]
 
-    # Get distributed quantities grouped by product_name
-    distribution = (
-        Distrib.objects
-        .filter(is_active=True)
-        .values('product__product_name')
-        .annotate(total_distributed=Sum('distrib_quantity'))
-    )
+    def __str__(self):
+        return f"{self.quantity} from {self.product_id} for distribution {self.distrib_id}"
 
-    # Convert to dict for quick access
-    inventory_dict = {item['product_name']: item['total_stock'] for item in inventory}
-    distribution_dict = {item['product__product_name']: item['total_distributed'] for item in distribution}
 
-    # Merge them
-    all_product_names = set(inventory_dict) | set(distribution_dict)
-    summary = []
+def summary_row(row):
+    return {
+        'product_name': row['product_name'],
+        'inventory_quantity': row['on_hand'],
+        'distributed_quantity': row['distributed'],
+    }
 
-    for name in all_product_names:
-        summary.append({
-            'product_name': name,
-            'inventory_quantity': inventory_dict.get(name, 0),
-            'distributed_quantity': distribution_dict.get(name, 0)
-        })
 
-    return summary
+def get_inventory_distribution_summary():
+    return [summary_row(row) for row in ProductStock.objects.values('product_name', 'on_hand', 'distributed')]
+
+
+async def aget_inventory_distribution_summary():
+    return [summary_row(row) async for row in ProductStock.objects.values('product_name', 'on_hand', 'distributed')]
+
+
+# dashboard counters: one grouped query per table
+def get_dashboard_stats():
+    today = timezone.now().date()
+    active = Q(is_archived=False)
+
+    users = {'total': 0, 'by_role': {}, 'by_status': {}}
+    for row in User.objects.values('role', 'status').annotate(n=Count('id')).order_by():
+        users['total'] += row['n']
+        users['by_role'][row['role']] = users['by_role'].get(row['role'], 0) + row['n']
+        users['by_status'][row['status']] = users['by_status'].get(row['status'], 0) + row['n']
+
+    inventory = with_reorder_levels(Product.all_objects.all()).aggregate(
+        products=Count('product_name', filter=active, distinct=True),
+        active_batches=Count('product_id', filter=active),
+        archived_batches=Count('product_id', filter=Q(is_archived=True)),
+        on_hand=Sum('product_qty', filter=active, default=0),
+        low_stock=Count('product_id', filter=active & LOW_STOCK),
+        expiring_soon=Count('product_id', filter=active & Q(
+            product_expiry__gte=today,
+            product_expiry__lte=today + timedelta(days=Product.EXPIRY_WARNING_DAYS),
+        )),
+        expired=Count('product_id', filter=active & Q(product_expiry__lt=today)),
+    )
+
+    distributions = Distrib.objects.aggregate(
+        total=Count('distrib_id'),
+        active=Count('distrib_id', filter=Q(is_active=True)),
+        units=Sum('distrib_quantity', filter=Q(is_active=True), default=0),
+        units_last_30_days=Sum('distrib_quantity', filter=Q(
+            is_active=True, created_at__gte=timezone.now() - timedelta(days=30),
+        ), default=0),
+    )
+
+    return {'users': users, 'inventory': inventory, 'distributions': distributions}
@@ -0,0 +1,114 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Cursor pagination on a unique ascending sort key, e.g. (product_expiry, product_id).
+# Each page is a range query starting after the previous page's last row, so page N
+# costs the same as page 1. Lists stay unpaginated unless ?page_size= or ?cursor= is sent.
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('pk',)
+    optional = True
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def get_page_size(self, request):
+        default = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 100
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except ValueError:
+            size = default
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        return position
+
+    def encode_cursor(self, row):
+        position = [getattr(row, field) for field in self.ordering]
+        position = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+
+    def after(self, position):
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y)
+        clauses = []
+        for i, field in enumerate(self.ordering):
+            equal = {self.ordering[j]: position[j] for j in range(i)}
+            clauses.append(Q(**equal, **{f'{field}__gt': position[i]}))
+        return reduce(or_, clauses)
+
+    def prepare(self, queryset, request, view):
+        params = request.query_params
+        if self.optional and self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset[:self.page_size + 1]
+
+    def finish(self, rows):
+        self.has_next = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.finish(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.finish([row async for row in queryset])
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'page_size': self.page_size,
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+# for endpoints that must never return the whole table, e.g. search
+class RequiredKeysetPagination(KeysetPagination):
+    optional = False
@@ -0,0 +1,97 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ProductStock, StockRollup
+from .reports import day_start
+
+HISTORY_DAYS = 730
+AVERAGE_DAYS = 28  # trailing moving average that stands for current daily demand
+LEAD_TIME_DAYS = 7  # days of demand a reorder has to cover until stock arrives
+SERVICE_Z = 1.65  # safety stock for ~95% of lead times without running out
+CHUNK_SIZE = 50000
+FIELDS = ['reorder_point', 'daily_demand', 'demand_std', 'days_of_cover', 'reorder_computed_at']
+
+
+def load_history(names, end, days):
+    # products x days of units distributed (net of edit restores), oldest day first: one
+    # grouped query over the daily rollups, streamed into the matrix. A product/day with no
+    # row is a zero.
+    index = {name: i for i, name in enumerate(names)}
+    last_day = timezone.localtime(end).date()
+    columns = {day_start(last_day - timedelta(days=days - column)): column for column in range(days)}
+    demand = np.zeros((len(names), days))
+
+    rows = (
+        StockRollup.objects
+        .filter(bucket='day', period_start__gte=min(columns), period_start__lt=end)
+        .exclude(distributed=0)
+        .values_list('product_name', 'period_start')
+        .annotate(units=Sum('distributed'))
+        .order_by()
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for name, start, units in rows:
+        row = index.get(name)
+        if row is not None:
+            demand[row, columns[start]] = units
+    return demand
+
+
+def demand_model(demand, on_hand):
+    # All products in one vectorized pass. Days before a product's first distribution are
+    # left out, so new products are not averaged down by history they never had.
+    count, days = demand.shape
+    seen = (demand != 0).any(axis=1)
+    first = np.where(seen, (demand != 0).argmax(axis=1), days)
+    active = np.arange(days) >= first[:, None]
+    active_days = active.sum(axis=1)
+
+    recent = active & (np.arange(days) >= days - AVERAGE_DAYS)
+    daily = np.divide((demand * recent).sum(axis=1), recent.sum(axis=1), out=np.zeros(count), where=recent.any(axis=1))
+
+    mean = np.divide((demand * active).sum(axis=1), active_days, out=np.zeros(count), where=active_days > 0)
+    squares = (((demand - mean[:, None]) ** 2) * active).sum(axis=1)
+    std = np.sqrt(np.divide(squares, active_days - 1, out=np.zeros(count), where=active_days > 1))
+
+    reorder = np.ceil(daily * LEAD_TIME_DAYS + SERVICE_Z * std * math.sqrt(LEAD_TIME_DAYS))
+    cover = np.divide(on_hand, daily, out=np.full(count, np.nan), where=daily > 0)
+    return seen, daily, std, reorder, cover
+
+
+@transaction.atomic
+def compute_reorder_points(history_days=HISTORY_DAYS, today=None):
+    # Reorder point per product from the last `history_days` full days. Products with no
+    # distributions in that window keep a null point and the fixed low-stock threshold.
+    today = today or timezone.localdate()
+    stock = list(ProductStock.objects.order_by('product_name'))
+    names = [row.product_name for row in stock]
+    demand = load_history(names, day_start(today), history_days)
+    on_hand = np.array([row.on_hand for row in stock], dtype=float)
+    seen, daily, std, reorder, cover = demand_model(demand, on_hand)
+
+    now = timezone.now()
+    for i, row in enumerate(stock):
+        row.reorder_computed_at = now
+        if not seen[i]:
+            row.reorder_point = row.daily_demand = row.demand_std = row.days_of_cover = None
+            continue
+        row.reorder_point = int(reorder[i])
+        row.daily_demand = round(float(daily[i]), 3)
+        row.demand_std = round(float(std[i]), 3)
+        row.days_of_cover = None if np.isnan(cover[i]) else round(float(cover[i]), 1)
+    # upsert rather than bulk_update: one plain INSERT per batch instead of a CASE per field,
+    # and only the demand fields are written, so concurrent on_hand changes are kept
+    conn = transaction.get_connection()
+    ProductStock.objects.bulk_create(
+        stock,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['product_name'] if conn.features.supports_update_conflicts_with_target else None,
+        update_fields=FIELDS,
+    )
+    return {'products': len(stock), 'with_reorder_point': int(seen.sum())}
@@ -0,0 +1,87 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Product, Distrib
+
+CHUNK_SIZE = 2000
+
+INVENTORY_COLUMNS = [
+    'product_id', 'barcode_no', 'product_name', 'product_detail',
+    'product_qty', 'product_expiry', 'is_archived', 'archived_at',
+]
+DISTRIBUTION_COLUMNS = [
+    'distrib_id', 'created_at', 'product_id', 'product__product_name', 'distrib_quantity', 'is_active',
+]
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class Echo:
+    # csv.writer target that hands each row back instead of buffering it
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, columns, key, chunk_size=CHUNK_SIZE):
+    # Keyset-chunked reads: MySQL drivers buffer a whole result set even with .iterator(),
+    # so each chunk is its own small query and at most one chunk is held in memory
+    key_index = columns.index(key)
+    queryset = queryset.order_by(key).values_list(*columns)
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(**{f'{key}__gt': last})
+        rows = list(chunk[:chunk_size].iterator(chunk_size=chunk_size))
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][key_index]
+
+
+def inventory_rows(params):
+    products = Product.all_objects.all()
+    if params.get('product_name'):
+        products = products.filter(product_name=params['product_name'])
+    if params.get('archived') in ('true', 'false'):
+        products = products.filter(is_archived=params['archived'] == 'true')
+    if parse_date(params.get('date_from') or ''):
+        products = products.filter(product_expiry__gte=parse_date(params['date_from']))
+    if parse_date(params.get('date_to') or ''):
+        products = products.filter(product_expiry__lte=parse_date(params['date_to']))
+    return INVENTORY_COLUMNS, iter_rows(products, INVENTORY_COLUMNS, 'product_id')
+
+
+def distribution_rows(params):
+    distribs = Distrib.objects.all()
+    if params.get('product_name'):
+        distribs = distribs.filter(product__product_name=params['product_name'])
+    if params.get('active') in ('true', 'false'):
+        distribs = distribs.filter(is_active=params['active'] == 'true')
+    if parse_date(params.get('date_from') or ''):
+        distribs = distribs.filter(created_at__gte=day_start(parse_date(params['date_from'])))
+    if parse_date(params.get('date_to') or ''):
+        distribs = distribs.filter(created_at__lt=day_start(parse_date(params['date_to']) + timedelta(days=1)))
+    return DISTRIBUTION_COLUMNS, iter_rows(distribs, DISTRIBUTION_COLUMNS, 'distrib_id')
+
+
+def header_names(columns):
+    return [column.replace('product__', '') for column in columns]
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header_names(columns))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(columns, rows):
+    names = header_names(columns)
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
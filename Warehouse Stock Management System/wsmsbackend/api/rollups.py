@@ -0,0 +1,151 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, Case, When, Value, IntegerField, Min, Sum
+from django.utils import timezone
+
+from .models import StockMovement, StockRollup, Distrib
+from .reports import iter_rows
+
+# Served bucket sizes and the stored rollup each one is summed from
+BUCKETS = {'hour': 'hour', 'day': 'day', 'week': 'day', 'month': 'day'}
+STORED_BUCKETS = ('hour', 'day')
+FIELDS = ('received', 'distributed', 'net_change')
+MAX_POINTS = 2000
+
+
+def period_start(moment, bucket):
+    local = timezone.localtime(moment)
+    if bucket == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    day = local.date()
+    if bucket == 'week':
+        day -= timedelta(days=day.weekday())
+    elif bucket == 'month':
+        day = day.replace(day=1)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def next_period(start, bucket):
+    if bucket == 'hour':
+        return start + timedelta(hours=1)
+    day = timezone.localtime(start).date()
+    if bucket == 'day':
+        day += timedelta(days=1)
+    elif bucket == 'week':
+        day += timedelta(days=7)
+    else:
+        day = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def movement_totals(kind, quantity):
+    return {
+        'received': quantity if kind == 'receive' else 0,
+        # restores come from distribution edits and net off what was distributed
+        'distributed': -quantity if kind in ('distribute', 'restore') else 0,
+        'net_change': quantity,
+    }
+
+
+def empty_changes():
+    return defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+
+
+def accumulate(changes, moment, product_name, totals):
+    for bucket in STORED_BUCKETS:
+        row = changes[(bucket, period_start(moment, bucket), product_name)]
+        for field, value in totals.items():
+            row[field] += value
+
+
+def apply(changes):
+    # Insert missing buckets, then increment in place so concurrent writers add up:
+    # one UPDATE per (bucket, period), however many products moved in it
+    changes = {key: row for key, row in changes.items() if any(row.values())}
+    if not changes:
+        return
+    StockRollup.objects.bulk_create(
+        [StockRollup(bucket=bucket, period_start=start, product_name=name) for bucket, start, name in changes],
+        ignore_conflicts=True,
+    )
+    periods = defaultdict(dict)
+    for (bucket, start, name), row in changes.items():
+        periods[(bucket, start)][name] = row
+    for (bucket, start), rows in periods.items():
+        updates = {
+            field: F(field) + Case(
+                *[When(product_name=name, then=Value(row[field])) for name, row in rows.items()],
+                default=Value(0), output_field=IntegerField(),
+            )
+            for field in FIELDS
+        }
+        StockRollup.objects.filter(bucket=bucket, period_start=start, product_name__in=rows.keys()).update(**updates)
+
+
+def add(movements):
+    # called with every batch of ledger rows as it is written
+    changes = empty_changes()
+    for movement in movements:
+        accumulate(changes, movement.created_at, movement.product_name, movement_totals(movement.kind, movement.quantity))
+    apply(changes)
+
+
+@transaction.atomic
+def backfill():
+    # Rebuild from the ledger. Distributions older than the ledger only add to `distributed`:
+    # what was received before it is not known, so they can't move the stock level.
+    StockRollup.objects.all().delete()
+    changes = empty_changes()
+
+    columns = ['movement_id', 'created_at', 'product_name', 'kind', 'quantity']
+    for _, created_at, name, kind, quantity in iter_rows(StockMovement.objects.all(), columns, 'movement_id'):
+        accumulate(changes, created_at, name, movement_totals(kind, quantity))
+
+    older = Distrib.objects.filter(is_active=True)
+    ledger_start = StockMovement.objects.aggregate(first=Min('created_at'))['first']
+    if ledger_start is not None:
+        older = older.filter(created_at__lt=ledger_start)
+    columns = ['distrib_id', 'created_at', 'product__product_name', 'distrib_quantity']
+    for _, created_at, name, quantity in iter_rows(older, columns, 'distrib_id'):
+        accumulate(changes, created_at, name, {'distributed': quantity})
+
+    rows = [
+        StockRollup(bucket=bucket, period_start=start, product_name=name, **row)
+        for (bucket, start, name), row in changes.items() if any(row.values())
+    ]
+    StockRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def timeseries(bucket, start, end, product_name=None):
+    # Buckets covering [start, end), zero-filled, with the stock level at the end of each.
+    # Reads only rollups plus one snapshot-bounded on_hand_at for the opening level.
+    from .ledger import on_hand_at
+
+    periods = []
+    current = period_start(start, bucket)
+    while current < end:
+        if len(periods) == MAX_POINTS:
+            raise ValueError(f"Range has more than {MAX_POINTS} {bucket} buckets.")
+        periods.append(current)
+        current = next_period(current, bucket)
+
+    rows = StockRollup.objects.filter(bucket=BUCKETS[bucket], period_start__gte=periods[0], period_start__lt=current)
+    if product_name:
+        rows = rows.filter(product_name=product_name)
+    rows = rows.values('period_start').annotate(**{f'total_{field}': Sum(field) for field in FIELDS}).order_by()
+
+    points = {period: dict.fromkeys(FIELDS, 0) for period in periods}
+    for row in rows:
+        point = points[period_start(row['period_start'], bucket)]
+        for field in FIELDS:
+            point[field] += row[f'total_{field}']
+
+    on_hand = on_hand_at(periods[0] - timedelta(microseconds=1), product_name)
+    series = []
+    for period in periods:
+        on_hand += points[period]['net_change']
+        series.append({'period_start': period, **points[period], 'on_hand': on_hand})
+    return series
@@ -0,0 +1,123 @@
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+# Read-only endpoints whose queries may be served by the replica
+REPLICA_VIEWS = {
+    'product-list', 'items-list', 'product-detail', 'product-search',
+    'product-by-barcode', 'product-by-barcode-batch', 'stock-at',
+    'distrib-list', 'distribs-list', 'distrib-detail', 'distrib-preview',
+    'grouped-products', 'inventory-summary', 'dashboard-stats',
+    'report-export', 'report-timeseries', 'get_users', 'user_list',
+    'async-product-list', 'async-product-detail', 'async-product-by-barcode', 'async-product-by-barcode-batch',
+    'async-distrib-list', 'async-distrib-detail', 'async-grouped-products', 'async-inventory-summary',
+}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'wsms_primary_until'
+
+# set per request by ReplicaRoutingMiddleware; follows the request into sync_to_async threads
+use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+    return alias if alias and alias in connections.settings else None
+
+
+# Reads go to the replica only while use_replica is set; every write, and every read
+# outside a replica-eligible request, stays on the primary.
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # DatabaseCache entries (auth claim changes) are always read where they were written
+        if use_replica.get() and model._meta.app_label != 'django_cache':
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+# Sends GETs to REPLICA_VIEWS endpoints to the replica unless this client wrote within
+# READ_YOUR_WRITES_SECONDS; any successful write (re)starts that window via a cookie.
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def replica_allowed(self, request):
+        if request.method not in SAFE_METHODS or replica_alias() is None:
+            return False
+        try:
+            if float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time():
+                return False
+        except ValueError:
+            pass
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        return match.url_name in REPLICA_VIEWS
+
+    def finish(self, request, response, allowed):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            window = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5)
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + window:.3f}', max_age=window, httponly=True, samesite='Lax')
+        if allowed and response.streaming:
+            response.streaming_content = self.on_replica(response.streaming_content)
+        return response
+
+    def on_replica(self, content):
+        # Streamed reports run their queries after the middleware has returned. Set per
+        # chunk: under ASGI each chunk may be produced in a fresh copy of the context.
+        content = iter(content)
+        try:
+            while True:
+                use_replica.set(True)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    return
+                yield chunk
+        finally:
+            use_replica.set(False)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        allowed = self.replica_allowed(request)
+        token = use_replica.set(allowed)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        return self.finish(request, response, allowed)
+
+    async def __acall__(self, request):
+        allowed = self.replica_allowed(request)
+        token = use_replica.set(allowed)
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        return self.finish(request, response, allowed)
+
+
+def replicate_sqlite(primary='default', replica=None):
+    # Local testing: copy the primary SQLite database over the replica in one go
+    replica = replica or replica_alias()
+    source, target = connections[primary], connections[replica]
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
@@ -0,0 +1,34 @@
+import re
+from functools import reduce
+from operator import and_
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TERM = re.compile(r'\w+')
+MAX_TERMS = 8
+
+
+def search_terms(query):
+    return TERM.findall(query)[:MAX_TERMS]
+
+
+def prefix_filter(products, prefix):
+    # product_name LIKE 'prefix%': a range scan on the name-leading indexes
+    return products.filter(product_name__istartswith=prefix)
+
+
+def fulltext_filter(products, query):
+    # Every term must match as a word prefix in product_name or product_detail
+    terms = search_terms(query)
+    if not terms:
+        return products.none()
+    if connection.vendor == 'mysql':
+        against = ' '.join(f'+{term}*' for term in terms)
+        return products.alias(
+            relevance=RawSQL('MATCH (product_name, product_detail) AGAINST (%s IN BOOLEAN MODE)', [against])
+        ).filter(relevance__gt=0)
+    return products.filter(reduce(and_, (
+        Q(product_name__icontains=term) | Q(product_detail__icontains=term) for term in terms
+    )))
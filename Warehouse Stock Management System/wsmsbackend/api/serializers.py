@@ -5,7 +5,9 @@ from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from django.core.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
-from .models import Product, Distrib, User, Notification
+from .models import Product, ProductStock, Distrib, User, Notification, inventory_write
+from .categories import classify
+from .ledger import record, transfer_movements, write
 
 
 # user
@@ -33,6 +35,8 @@ class UserSerializer(serializers.ModelSerializer):
 class ProductSerializer(serializers.ModelSerializer):
     is_archived = serializers.BooleanField(read_only=True)
     archived_at = serializers.DateTimeField(read_only=True)
+    # on update: the version the client read; defaults to the one loaded for this request
+    version = serializers.IntegerField(min_value=1, required=False)
 
     class Meta:
         model = Product
@@ -43,8 +47,10 @@ class ProductSerializer(serializers.ModelSerializer):
             'product_detail',
             'product_qty',
             'product_expiry',
+            'category',
             'is_archived',
             'archived_at',
+            'version',
         ]
 
     def validate_product_qty(self, value):
@@ -54,10 +60,47 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(f"Product quantity cannot exceed {Product.MAX_STOCK}.")
         return value
 
+    def validate(self, attrs):
+        # new or renamed products take their category from the name unless one is given
+        if 'category' not in attrs and 'product_name' in attrs:
+            if self.instance is None or self.instance.product_name != attrs['product_name']:
+                attrs['category'] = classify(attrs['product_name'])
+        return attrs
+
+    @inventory_write()
+    def create(self, validated_data):
+        validated_data.pop('version', None)
+        product = super().create(validated_data)
+        record('receive', [(product, product.product_qty)])
+        ProductStock.objects.adjust(product.product_name, on_hand=product.product_qty, active_batches=1)
+        ProductStock.objects.refresh_expiry(product.product_name)
+        return product
+
+    @inventory_write()
     def update(self, instance, validated_data):
         if instance.is_archived:
             raise serializers.ValidationError("This product is archived. Reactivate it first to update.")
-        return super().update(instance, validated_data)
+        if validated_data.pop('product_id', instance.product_id) != instance.product_id:
+            raise serializers.ValidationError({'product_id': ["A batch's product ID can't be changed."]})
+        instance.version = validated_data.pop('version', instance.version)
+        old_name, old_qty = instance.product_name, instance.product_qty
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save_versioned(list(validated_data))
+        product = instance
+        if product.product_name != old_name and old_qty:
+            write(transfer_movements(product, old_name, old_qty))
+        if product.product_qty != old_qty:
+            record('adjust', [(product, product.product_qty - old_qty)])
+
+        if product.product_name != old_name:
+            ProductStock.objects.adjust(old_name, on_hand=-old_qty, active_batches=-1)
+            ProductStock.objects.refresh_expiry(old_name)
+            ProductStock.objects.adjust(product.product_name, on_hand=product.product_qty, active_batches=1)
+        elif product.product_qty != old_qty:
+            ProductStock.objects.adjust(product.product_name, on_hand=product.product_qty - old_qty)
+        ProductStock.objects.refresh_expiry(product.product_name)
+        return product
     
 
 #  product reactivation serializer
@@ -111,7 +154,7 @@ class ProductReactivateView(GenericAPIView):
                 return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
             # Notify if the product is low on stock or expiring soon after reactivation
-            if product.is_low_stock():
+            if product.is_low_stock(ProductStock.objects.for_product(product.product_name)):
                 product.notify('low_stock', f"{product.product_name} is low on stock: {product.product_qty} left.")
             if product.is_expiring_soon():
                 product.notify('expiring_soon', f"{product.product_name} is expiring on {product.product_expiry}.")
@@ -138,6 +181,7 @@ class DistribSerializer(serializers.ModelSerializer):
             'product_qty',
             'distrib_quantity',
             'is_active',
+            'created_at',
         ]
 
     def create(self, validated_data):
@@ -145,9 +189,39 @@ class DistribSerializer(serializers.ModelSerializer):
         
         # Check low stock and expiring soon for the product
         product = distrib.product
-        if product.is_low_stock():
+        if product.is_low_stock(ProductStock.objects.for_product(product.product_name)):
             product.notify('low_stock', f"{product.product_name} is low on stock: {product.product_qty} left.")
         if product.is_expiring_soon():
             product.notify('expiring_soon', f"{product.product_name} is expiring on {product.product_expiry}.")
         
-        return distrib
\ No newline at end of file
+        return distrib
+
+#  bulk distribution (pick list)
+class DistribBulkLineSerializer(serializers.Serializer):
+    product_name = serializers.CharField(required=False)
+    product_id = serializers.CharField(required=False)
+    quantity = serializers.IntegerField(min_value=1)
+
+    def validate(self, attrs):
+        if not attrs.get('product_name') and not attrs.get('product_id'):
+            raise serializers.ValidationError("Either product_name or product_id is required.")
+        return attrs
+
+
+class DistribBulkSerializer(serializers.Serializer):
+    MAX_LINES = 500
+    MODE_CHOICES = ['all_or_nothing', 'best_effort']
+
+    mode = serializers.ChoiceField(choices=MODE_CHOICES, default='all_or_nothing')
+    lines = DistribBulkLineSerializer(many=True, allow_empty=False, max_length=MAX_LINES)
+
+
+#  barcode batch scan
+class BarcodeBatchSerializer(serializers.Serializer):
+    MAX_BARCODES = 1000
+
+    barcodes = serializers.ListField(
+        child=serializers.CharField(max_length=20),
+        allow_empty=False,
+        max_length=MAX_BARCODES,
+    )
@@ -0,0 +1,25 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .barcodes import forget_batches
+from .middleware import install_query_tracker
+from .models import User, Product, Distrib, InventoryVersion
+
+
+# bulk_create/bulk_update paths bump the version themselves. Inside inventory_write()
+# these bumps are folded into the block's single bump at its end.
+# User writes are rare and the dashboard stats include user counts.
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Distrib)
+@receiver([post_save, post_delete], sender=User)
+def bump_inventory_version(sender, **kwargs):
+    InventoryVersion.objects.bump()
+
+
+@receiver([post_save, post_delete], sender=Product)
+def forget_barcode(sender, instance, **kwargs):
+    forget_batches([instance])
+
+
+connection_created.connect(install_query_tracker)
@@ -0,0 +1,16 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+# Tests read from the primary only, even when a replica is configured: TestCase data is
+# never replicated. Replica tests opt back in with
+# @override_settings(REPLICA_DATABASE_ALIAS='replica') and databases = '__all__'.
+class PrimaryOnlyTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.primary_only = override_settings(REPLICA_DATABASE_ALIAS=None)
+        self.primary_only.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.primary_only.disable()
+        super().teardown_test_environment(**kwargs)
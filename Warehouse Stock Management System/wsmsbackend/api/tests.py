@@ -1,3 +1,1282 @@
-from django.test import TestCase
+import importlib.util
+import json
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Q, Count, Min, Sum
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import benchmark
+from .alerts import scan_inventory_alerts
+from .ledger import on_hand_at, take_snapshot
+from .rollups import backfill
+from .authentication import ClaimsJWTAuthentication, claims_key, local_claims
+from .allocation import allocate_fifo, lock_fifo_heads, preview_fifo
+from .barcodes import resolver
+from .models import (
+    User, Product, ProductStock, Distrib, Notification, StockMovement, StockRollup, StockSnapshot, VersionConflict,
+    DistribAllocation, AlertScanState,
+)
+from .reports import INVENTORY_COLUMNS, day_start, iter_rows
+from .routers import STICKY_COOKIE, replicate_sqlite
+
+
+def make_batches(product_name, quantities, year=2030):
+    batches = []
+    for i, qty in enumerate(quantities):
+        batches.append(Product.objects.create(
+            product_id=f"{product_name}-{i}",
+            barcode_no='4800000000001',
+            product_name=product_name,
+            product_detail='test batch',
+            product_qty=qty,
+            product_expiry=date(year, 1, 1) + timedelta(days=i),
+        ))
+    ProductStock.objects.rebuild()
+    return batches
+
+
+# fifo allocation
+class FifoAllocationTests(TestCase):
+    def test_drains_oldest_batches_first(self):
+        make_batches('Soap', [100, 200, 300])
+        allocations, head = allocate_fifo('Soap', 250)
+
+        self.assertEqual([(b.product_id, taken) for b, taken in allocations], [('Soap-0', 100), ('Soap-1', 150)])
+        self.assertEqual(head.product_id, 'Soap-1')
+        self.assertTrue(Product.all_objects.get(product_id='Soap-0').is_archived)
+        self.assertEqual(Product.objects.get(product_id='Soap-1').product_qty, 50)
+
+        stock = ProductStock.objects.get(product_name='Soap')
+        self.assertEqual((stock.on_hand, stock.active_batches), (350, 2))
+        self.assertEqual(stock.earliest_expiry, date(2030, 1, 2))
+
+    def test_insufficient_stock_writes_nothing(self):
+        make_batches('Soap', [100, 100])
+        with self.assertRaises(ValidationError):
+            allocate_fifo('Soap', 201)
+        self.assertEqual(ProductStock.objects.on_hand('Soap'), 200)
+        self.assertEqual(sum(Product.objects.values_list('product_qty', flat=True)), 200)
+
+    def test_query_count_does_not_depend_on_batches_touched(self):
+        make_batches('Soap', [10] * 2)
+        make_batches('Rice', [10] * 40)
+
+        with CaptureQueriesContext(connection) as two_batches:
+            allocate_fifo('Soap', 15)
+        with CaptureQueriesContext(connection) as forty_batches:
+            allocate_fifo('Rice', 395)
+        self.assertEqual(len(two_batches), len(forty_batches))
+
+    def test_locks_only_the_batches_each_product_draws_on(self):
+        make_batches('Soap', [10] * 4)
+        make_batches('Rice', [10] * 3)
+        with CaptureQueriesContext(connection) as queries:
+            batches = lock_fifo_heads({'Soap': 15, 'Rice': 10})
+
+        # what the quantity reaches, plus the batch after it, which may become the head
+        self.assertEqual([batch.product_id for batch in batches['Soap']], ['Soap-0', 'Soap-1', 'Soap-2'])
+        self.assertEqual([batch.product_id for batch in batches['Rice']], ['Rice-0', 'Rice-1'])
+        self.assertEqual(len(queries), 2)
+
+    def test_locks_everything_when_the_quantity_is_not_covered(self):
+        make_batches('Soap', [10] * 3)
+        self.assertEqual(len(lock_fifo_heads({'Soap': 40})['Soap']), 3)
+
+    def test_distribution_draws_fifo_whichever_batch_it_names(self):
+        batches = make_batches('Soap', [100, 100])
+        distrib = Distrib.objects.create(product=batches[1], distrib_quantity=30)
+
+        self.assertEqual(distrib.product.product_id, 'Soap-0')
+        self.assertEqual(list(distrib.allocations.values_list('product_id', 'quantity')), [('Soap-0', 30)])
+        with self.assertRaises(ValidationError):
+            Distrib.objects.create(product=batches[1], distrib_quantity=171)
+        self.assertEqual(ProductStock.objects.on_hand('Soap'), 170)
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create(username='admin'))
+
+
+# stock totals
+class ProductStockTests(ApiTestCase):
+    def assert_in_sync(self):
+        batches = (
+            Product.objects
+            .values('product_name')
+            .annotate(
+                on_hand=Sum('product_qty'),
+                active_batches=Count('product_id'),
+                earliest_expiry=Min('product_expiry', filter=Q(product_qty__gt=0)),
+            )
+        )
+        expected = {row['product_name']: (row['on_hand'], row['active_batches'], row['earliest_expiry']) for row in batches}
+        totals = {
+            row.product_name: (row.on_hand, row.active_batches, row.earliest_expiry)
+            for row in ProductStock.objects.all() if row.on_hand or row.active_batches
+        }
+        self.assertEqual(totals, expected)
+
+    def create(self, product_id, product_name, qty, expiry):
+        response = self.client.post('/api/products/create/', {
+            'product_id': product_id, 'barcode_no': '4800000000001', 'product_name': product_name,
+            'product_detail': 'test batch', 'product_qty': qty, 'product_expiry': expiry,
+        })
+        self.assertEqual(response.status_code, 201)
+
+    def update(self, product_id, **changes):
+        data = {**self.client.get(f'/api/products/id/{product_id}/').data, **changes}
+        self.assertEqual(self.client.put(f'/api/products/update/{product_id}/', data, format='json').status_code, 200)
+
+    def test_totals_follow_every_product_write(self):
+        self.create('Soap-0', 'Soap', 100, '2030-01-02')
+        self.create('Soap-1', 'Soap', 200, '2030-01-01')
+        self.create('Rice-0', 'Rice', 50, '2030-03-01')
+        self.assert_in_sync()
+
+        self.update('Soap-0', product_qty=40)
+        self.assert_in_sync()
+
+        self.update('Soap-1', product_name='Rice')
+        self.assert_in_sync()
+        self.assertEqual(ProductStock.objects.get(product_name='Soap').earliest_expiry, date(2030, 1, 2))
+
+        self.assertEqual(self.client.post('/api/products/Rice-0/archive/').status_code, 200)
+        self.assert_in_sync()
+
+        response = self.client.post('/api/products/Rice-0/reactivate/', {'product_qty': 70, 'product_expiry': '2029-12-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assert_in_sync()
+        self.assertEqual(ProductStock.objects.on_hand('Rice'), 270)
+
+    def test_rebuild_command_repairs_drift(self):
+        make_batches('Soap', [100, 200])
+        make_batches('Rice', [50])
+        Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=120)
+        ProductStock.objects.filter(product_name='Soap').update(reorder_point=30, reorder_computed_at=timezone.now())
+        ProductStock.objects.filter(product_name='Soap').update(on_hand=0, distributed=0, active_batches=9)
+        ProductStock.objects.filter(product_name='Rice').delete()
+
+        out = StringIO()
+        call_command('rebuild_stock_totals', stdout=out)
+        self.assertIn('2 products', out.getvalue())
+        self.assert_in_sync()
+        soap = ProductStock.objects.get(product_name='Soap')
+        self.assertEqual((soap.distributed, soap.reorder_point), (120, 30))
+
+
+# bulk distribution
+class DistribBulkTests(ApiTestCase):
+    def test_all_or_nothing_rejects_whole_order(self):
+        make_batches('Soap', [100, 100])
+        make_batches('Rice', [50])
+        response = self.client.post('/api/distributions/bulk/', {
+            'lines': [
+                {'product_name': 'Soap', 'quantity': 150},
+                {'product_id': 'Rice-0', 'quantity': 60},
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['accepted'])
+        self.assertEqual([line['status'] for line in response.data['results']], ['ok', 'error'])
+        self.assertEqual(Distrib.objects.count(), 0)
+        self.assertEqual(ProductStock.objects.on_hand('Soap'), 200)
+
+    def test_best_effort_keeps_lines_that_fit(self):
+        make_batches('Soap', [100, 100])
+        make_batches('Rice', [50])
+        response = self.client.post('/api/distributions/bulk/', {
+            'mode': 'best_effort',
+            'lines': [
+                {'product_name': 'Soap', 'quantity': 150},
+                {'product_name': 'Rice', 'quantity': 60},
+                {'product_name': 'Soap', 'quantity': 50},
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['distributed'], 2)
+        self.assertEqual(Distrib.objects.count(), 2)
+        self.assertEqual(Product.objects.filter(product_name='Soap').count(), 0)
+        stock = ProductStock.objects.get(product_name='Soap')
+        self.assertEqual((stock.on_hand, stock.distributed, stock.active_batches), (0, 200, 0))
+
+    def test_backends_without_bulk_insert_ids_still_record_allocations(self):
+        # as on MySQL, where bulk_create leaves the pks unset
+        make_batches('Soap', [100, 100])
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.client.post('/api/distributions/bulk/', {
+                'lines': [{'product_name': 'Soap', 'quantity': 150}, {'product_name': 'Soap', 'quantity': 20}],
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        first, second = [Distrib.objects.get(pk=line['distrib_id']) for line in response.data['results']]
+        self.assertEqual(sorted(first.allocations.values_list('product_id', 'quantity')), [('Soap-0', 100), ('Soap-1', 50)])
+        self.assertEqual(StockMovement.objects.filter(distrib=second, kind='distribute').count(), 1)
+
+        first.distrib_quantity = 60
+        first.save()
+        self.assertEqual(list(Product.all_objects.order_by('product_id').values_list('product_qty', flat=True)), [40, 80])
+
+    def test_query_count_does_not_depend_on_lines(self):
+        for i in range(20):
+            make_batches(f"Item {i}", [100, 100])
+
+        def post(count):
+            lines = [{'product_name': f"Item {i}", 'quantity': 20} for i in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/distributions/bulk/', {'lines': lines}, format='json')
+            self.assertEqual(response.status_code, 201)
+            return len(queries)
+
+        self.assertEqual(post(2), post(20))
+        # and where bulk inserts return no ids (MySQL): one extra query to read them back
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.assertEqual(post(2), post(20))
+
+
+# optimistic concurrency
+class ProductVersionTests(ApiTestCase):
+    def edit(self, pk, **changes):
+        data = {**self.client.get(f'/api/products/id/{pk}/').data, **changes}
+        return self.client.put(f'/api/products/update/{pk}/', data, format='json')
+
+    def version(self, product_id):
+        return Product.all_objects.get(product_id=product_id).version
+
+    def test_every_write_path_bumps_the_version(self):
+        make_batches('Soap', [100, 100])
+        distrib = Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=100)
+        self.assertEqual((self.version('Soap-0'), self.version('Soap-1')), (2, 1))
+        distrib.distrib_quantity = 50
+        distrib.save()
+        self.assertEqual((self.version('Soap-0'), self.version('Soap-1')), (3, 1))
+
+        batch = Product.all_objects.get(product_id='Soap-0')
+        batch.archive()
+        batch.reactivate(20, date(2031, 1, 1))
+        self.assertEqual(self.version('Soap-0'), 5)
+
+        response = self.edit('Soap-1', product_qty=10)
+        self.assertEqual((response.status_code, response.data['version']), (200, 2))
+
+    def test_stale_edit_is_rejected_instead_of_undoing_a_distribution(self):
+        make_batches('Soap', [100])
+        read = self.client.get('/api/products/id/Soap-0/').data
+        Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=30)
+
+        response = self.client.put('/api/products/update/Soap-0/', {**read, 'product_detail': 'relabelled'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        batch = Product.objects.get(product_id='Soap-0')
+        self.assertEqual((batch.product_qty, batch.product_detail), (70, 'test batch'))
+
+        self.assertEqual(self.edit('Soap-0', product_detail='relabelled').status_code, 200)
+        self.assertEqual(self.edit('Soap-0', product_id='Soap-9').status_code, 400)
+
+    def test_second_writer_with_same_read_loses(self):
+        make_batches('Soap', [100])
+        first = Product.objects.get(product_id='Soap-0')
+        second = Product.objects.get(product_id='Soap-0')
+        first.archive()
+        with self.assertRaises(VersionConflict):
+            second.archive()
+        self.assertEqual(StockMovement.objects.filter(kind='archive').count(), 1)
+
+
+# allocation preview
+class DistribPreviewTests(ApiTestCase):
+    def test_preview_matches_allocation_without_writing(self):
+        make_batches('Soap', [100, 80, 300, 100])
+        with self.assertNumQueries(1):
+            preview = preview_fifo('Soap', 250)
+        self.assertEqual(
+            [(batch['product_id'], batch['quantity'], batch['remaining'], batch['archived']) for batch in preview['batches']],
+            [('Soap-0', 100, 0, True), ('Soap-1', 80, 0, True), ('Soap-2', 70, 230, False)],
+        )
+        self.assertEqual((preview['on_hand'], preview['on_hand_after'], preview['enough_stock']), (580, 330, True))
+        self.assertEqual(Product.objects.filter(product_name='Soap').aggregate(total=Sum('product_qty'))['total'], 580)
+
+        allocations, _ = allocate_fifo('Soap', 250)
+        self.assertEqual(
+            [(batch.product_id, taken, batch.product_qty) for batch, taken in allocations],
+            [(batch['product_id'], batch['quantity'], batch['remaining']) for batch in preview['batches']],
+        )
+
+    def test_endpoint(self):
+        make_batches('Soap', [100, 50])
+        response = self.client.get('/api/distributions/preview/', {'product_name': 'Soap', 'quantity': 120})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([batch['low_stock'] for batch in response.data['batches']], [False, True])
+
+        response = self.client.get('/api/distributions/preview/', {'product_name': 'Soap', 'quantity': 200})
+        self.assertEqual((response.data['enough_stock'], response.data['shortfall'], len(response.data['batches'])), (False, 50, 2))
+        self.assertEqual(self.client.get('/api/distributions/preview/', {'product_name': 'Soap', 'quantity': 'x'}).status_code, 400)
+        self.assertEqual(Distrib.objects.count(), 0)
+
+    def test_low_stock_flags_match_what_allocation_notifies(self):
+        make_batches('Soap', [100, 300])
+        ProductStock.objects.filter(product_name='Soap').update(reorder_point=250)
+        self.assertEqual([batch['low_stock'] for batch in preview_fifo('Soap', 50)['batches']], [False])
+        self.assertEqual([batch['low_stock'] for batch in preview_fifo('Soap', 160)['batches']], [False, True])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            allocate_fifo('Soap', 160)
+        self.assertEqual(list(Notification.objects.filter(notif_type='low_stock').values_list('product_id', flat=True)), ['Soap-1'])
+
+
+# distribution edits
+class DistribAllocationTests(TestCase):
+    def allocations(self, distrib):
+        return sorted(distrib.allocations.values_list('product_id', 'quantity'))
+
+    def qty(self, product_id):
+        return Product.all_objects.get(product_id=product_id).product_qty
+
+    def test_shrink_returns_units_to_the_batches_they_came_from(self):
+        make_batches('Soap', [100, 100, 100])
+        distrib = Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=150)
+        self.assertEqual(self.allocations(distrib), [('Soap-0', 100), ('Soap-1', 50)])
+
+        distrib.distrib_quantity = 40
+        distrib.save()
+        # latest batch drawn first, then the older one is reopened
+        self.assertEqual([self.qty(f'Soap-{i}') for i in range(3)], [60, 100, 100])
+        self.assertFalse(Product.all_objects.get(product_id='Soap-0').is_archived)
+        self.assertEqual(self.allocations(distrib), [('Soap-0', 40)])
+        self.assertEqual(ProductStock.objects.on_hand('Soap'), 260)
+        self.assertEqual(StockMovement.objects.filter(kind='restore').aggregate(total=Sum('quantity'))['total'], 110)
+
+    def test_grow_allocates_only_the_difference(self):
+        make_batches('Soap', [100, 100])
+        distrib = Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=60)
+        distrib.distrib_quantity = 130
+        distrib.save()
+
+        self.assertEqual(self.allocations(distrib), [('Soap-0', 100), ('Soap-1', 30)])
+        self.assertEqual((self.qty('Soap-0'), self.qty('Soap-1')), (0, 70))
+        self.assertFalse(StockMovement.objects.filter(kind='restore').exists())
+        self.assertEqual(ProductStock.objects.on_hand('Soap'), 70)
+
+    def test_batch_archived_with_stock_is_not_reopened(self):
+        make_batches('Soap', [100, 100])
+        distrib = Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=150)
+        Product.objects.get(product_id='Soap-1').archive()
+
+        distrib.distrib_quantity = 100
+        distrib.save()
+        soap_1 = Product.all_objects.get(product_id='Soap-1')
+        self.assertEqual((soap_1.is_archived, soap_1.product_qty), (True, 50))
+        self.assertEqual(self.qty('Soap-0'), 50)
+        on_hand = Product.objects.filter(product_name='Soap').aggregate(total=Sum('product_qty'))['total']
+        self.assertEqual(ProductStock.objects.on_hand('Soap'), on_hand)
+        # make_batches records no receives, so the ledger holds the net change from 200
+        self.assertEqual(StockMovement.objects.aggregate(total=Sum('quantity'))['total'], on_hand - 200)
+
+    def test_distribution_without_allocations_falls_back_to_lifo(self):
+        make_batches('Soap', [100, 100])
+        distrib = Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=50)
+        DistribAllocation.objects.all().delete()
+        distrib.distrib_quantity = 20
+        distrib.save()
+        self.assertEqual(ProductStock.objects.on_hand('Soap'), 180)
+        self.assertEqual(self.qty('Soap-0') + self.qty('Soap-1'), 180)
+
+    def test_edit_cost_does_not_depend_on_open_batches(self):
+        make_batches('Soap', [10] * 5)
+        make_batches('Rice', [10] * 50)
+        soap = Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=15)
+        rice = Distrib.objects.create(product=Product.objects.get(product_id='Rice-0'), distrib_quantity=15)
+
+        for change in (10, -5):
+            soap.distrib_quantity += change
+            rice.distrib_quantity += change
+            with CaptureQueriesContext(connection) as few:
+                soap.save()
+            with CaptureQueriesContext(connection) as many:
+                rice.save()
+            self.assertEqual(len(few), len(many))
+
+
+# notifications
+class NotificationPipelineTests(TestCase):
+    def test_repeats_in_one_batch_are_written_by_one_upsert(self):
+        batch = make_batches('Soap', [100])[0]
+        with CaptureQueriesContext(connection) as queries:
+            with Notification.objects.batch():
+                with self.captureOnCommitCallbacks(execute=True):
+                    with transaction.atomic():
+                        for left in (90, 80, 70):
+                            batch.notify('low_stock', f"Soap is low on stock: {left} left.")
+                self.assertEqual(Notification.objects.count(), 0)
+
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "tbl_notification"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(list(Notification.objects.values_list('message', flat=True)), ["Soap is low on stock: 70 left."])
+
+    def test_rolled_back_notifications_are_dropped(self):
+        batch = make_batches('Soap', [100])[0]
+        with Notification.objects.batch() as pending:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        batch.notify('low_stock', "rolled back")
+                        raise ValueError
+                except ValueError:
+                    pass
+            self.assertEqual(pending, [])
+        self.assertFalse(Notification.objects.exists())
+
+    def test_repeats_within_window_are_coalesced(self):
+        batch = make_batches('Soap', [100])[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            batch.notify('low_stock', "first")
+        with self.captureOnCommitCallbacks(execute=True):
+            batch.notify('low_stock', "second")
+            batch.notify('expiring_soon', "expiring")
+
+        self.assertEqual(
+            sorted(Notification.objects.values_list('notif_type', 'message')),
+            [('expiring_soon', 'expiring'), ('low_stock', 'second')]
+        )
+
+    def test_compaction_keeps_latest_per_batch_and_type(self):
+        batch = make_batches('Soap', [100])[0]
+        old = timezone.now() - timedelta(days=10)
+        for n in range(3):
+            Notification.objects.create(
+                product=batch, notif_type='low_stock', message=str(n), window_start=old - timedelta(days=n)
+            )
+        Notification.objects.update(updated_at=old)
+
+        call_command('compact_notifications', stdout=StringIO())
+        self.assertEqual(list(Notification.objects.values_list('message', flat=True)), ['2'])
+
+
+class RequestNotificationTests(TransactionTestCase):
+    def test_one_upsert_per_request(self):
+        make_batches('Soap', [300, 100], year=timezone.now().year)
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create(username='admin'))
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/distributions/', {'product': 'Soap-0', 'distrib_quantity': 350})
+        self.assertEqual(response.status_code, 201)
+
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "tbl_notification"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            set(Notification.objects.values_list('product_id', 'notif_type')),
+            {('Soap-0', 'archived'), ('Soap-1', 'low_stock'), ('Soap-1', 'expiring_soon')},
+        )
+
+
+# alert scanner
+class AlertScanTests(TestCase):
+    def test_scanner_only_revisits_changed_batches(self):
+        today = timezone.now().date()
+        Product.objects.create(
+            product_id='exp', barcode_no='1', product_name='Milk', product_detail='carton',
+            product_qty=900, product_expiry=today + timedelta(days=5),
+        )
+        Product.objects.create(
+            product_id='low', barcode_no='2', product_name='Soap', product_detail='bar',
+            product_qty=20, product_expiry=today + timedelta(days=300),
+        )
+        Product.objects.create(
+            product_id='ok', barcode_no='3', product_name='Rice', product_detail='sack',
+            product_qty=900, product_expiry=today + timedelta(days=300),
+        )
+        Product.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(scan_inventory_alerts(), {'expiring_soon': 1, 'low_stock': 1})
+        self.assertEqual(scan_inventory_alerts(), {'expiring_soon': 0, 'low_stock': 0})
+
+        Product.objects.filter(product_id='ok').update(product_qty=10, updated_at=timezone.now())
+        self.assertEqual(scan_inventory_alerts(), {'expiring_soon': 0, 'low_stock': 1})
+        self.assertEqual(
+            sorted(Notification.objects.values_list('product_id', 'notif_type')),
+            [('exp', 'expiring_soon'), ('low', 'low_stock'), ('ok', 'low_stock')]
+        )
+
+    def test_row_committed_after_a_scan_with_an_earlier_timestamp_is_caught(self):
+        make_batches('Soap', [900])
+        scan_inventory_alerts()
+        scanned_at = AlertScanState.objects.get().scanned_at
+
+        # written before that scan's watermark but committed after it
+        Product.objects.update(product_qty=10, updated_at=scanned_at - timedelta(seconds=1))
+        self.assertEqual(scan_inventory_alerts()['low_stock'], 1)
+
+
+# summary cache
+class SummaryCacheTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['summaries'].clear()
+
+    def test_etag_revalidates_until_inventory_changes(self):
+        batches = make_batches('Soap', [100, 100])
+        first = self.client.get('/api/api/grouped-products/')
+        self.assertEqual(first.data, [{'product_name': 'Soap', 'total_quantity': 200}])
+
+        cached = self.client.get('/api/api/grouped-products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        Distrib.objects.create(product=batches[0], distrib_quantity=30)
+        changed = self.client.get('/api/api/grouped-products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(changed.data, [{'product_name': 'Soap', 'total_quantity': 170}])
+
+    def test_versioned_product_writes_invalidate(self):
+        make_batches('Soap', [100])
+        first = self.client.get('/api/api/grouped-products/')
+        stats = self.client.get('/api/dashboard/stats/')
+
+        data = {**self.client.get('/api/products/id/Soap-0/').data, 'product_qty': 40}
+        self.assertEqual(self.client.put('/api/products/update/Soap-0/', data, format='json').status_code, 200)
+        edited = self.client.get('/api/api/grouped-products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((edited.status_code, edited.data), (200, [{'product_name': 'Soap', 'total_quantity': 40}]))
+        self.assertNotEqual(self.client.get('/api/dashboard/stats/', HTTP_IF_NONE_MATCH=stats['ETag']).status_code, 304)
+
+        Product.objects.get(product_id='Soap-0').archive()
+        archived = self.client.get('/api/api/grouped-products/', HTTP_IF_NONE_MATCH=edited['ETag'])
+        self.assertEqual((archived.status_code, archived.data), (200, [{'product_name': 'Soap', 'total_quantity': 0}]))
+
+    def test_each_write_bumps_the_version_once_as_its_last_statement(self):
+        make_batches('Soap', [100, 100])
+        data = {**self.client.get('/api/products/id/Soap-1/').data, 'product_qty': 90}
+        writes = {
+            'edit': lambda: self.client.put('/api/products/update/Soap-1/', data, format='json'),
+            'distribution': lambda: Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=120),
+            'pick list': lambda: self.client.post(
+                '/api/distributions/bulk/', {'lines': [{'product_name': 'Soap', 'quantity': 10}]}, format='json'
+            ),
+            'archive': lambda: Product.objects.get(product_id='Soap-1').archive(),
+        }
+        for name, write in writes.items():
+            with self.subTest(name):
+                with CaptureQueriesContext(connection) as queries:
+                    write()
+                statements = [query['sql'] for query in queries]
+                bumps = [i for i, sql in enumerate(statements) if sql.startswith('UPDATE "tbl_inventory_version"')]
+                self.assertEqual(len(bumps), 1)
+                self.assertTrue(all(sql.startswith('RELEASE SAVEPOINT') for sql in statements[bumps[0] + 1:]))
+
+    def test_hits_and_misses_are_counted(self):
+        make_batches('Soap', [100])
+        self.client.get('/api/api/inventory-summary/')
+        response = self.client.get('/api/api/inventory-summary/')
+        self.assertEqual(response.data, [{'product_name': 'Soap', 'inventory_quantity': 100, 'distributed_quantity': 0}])
+
+        stats = self.client.get('/api/api/cache-stats/').data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+# stock ledger
+class StockLedgerTests(ApiTestCase):
+    def test_movements_and_point_in_time_stock(self):
+        for i in range(2):
+            self.client.post('/api/products/create/', {
+                'product_id': f'Soap-{i}', 'barcode_no': '4800000000001', 'product_name': 'Soap',
+                'product_detail': 'test batch', 'product_qty': 100, 'product_expiry': f'2030-01-0{i + 1}',
+            })
+        received = timezone.now()
+
+        distrib = Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=150)
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(distrib=distrib).values_list('kind', 'product_id', 'quantity')),
+            [('archive', 'Soap-0', 0), ('distribute', 'Soap-0', -100), ('distribute', 'Soap-1', -50)],
+        )
+        distributed = timezone.now()
+        take_snapshot(distributed)
+
+        distrib.distrib_quantity = 120
+        distrib.save()
+        self.assertEqual(on_hand_at(received, 'Soap'), 200)
+        self.assertEqual(on_hand_at(distributed, 'Soap'), 50)
+        self.assertEqual(on_hand_at(timezone.now(), 'Soap'), ProductStock.objects.on_hand('Soap'))
+
+        # answered from the snapshot plus later movements only
+        StockMovement.objects.filter(created_at__lte=distributed).delete()
+        self.assertEqual(on_hand_at(timezone.now(), 'Soap'), 80)
+        response = self.client.get('/api/products/stock-at/', {'at': distributed.isoformat(), 'product_name': 'Soap'})
+        self.assertEqual(response.json()['on_hand'], 50)
+
+    def test_rename_moves_stock_to_the_new_name(self):
+        self.client.post('/api/products/create/', {
+            'product_id': 'Soap-0', 'barcode_no': '4800000000001', 'product_name': 'Soap',
+            'product_detail': 'test batch', 'product_qty': 100, 'product_expiry': '2030-01-01',
+        })
+        take_snapshot(timezone.now())
+
+        data = {**self.client.get('/api/products/id/Soap-0/').data, 'product_name': 'Hand Soap', 'product_qty': 90}
+        self.assertEqual(self.client.put('/api/products/update/Soap-0/', data, format='json').status_code, 200)
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(kind='transfer').values_list('product_name', 'quantity')),
+            [('Hand Soap', 100), ('Soap', -100)],
+        )
+
+        renamed = timezone.now()
+        take_snapshot(renamed)
+        self.assertEqual(list(StockSnapshot.objects.filter(taken_at=renamed).values_list('product_name', 'on_hand')), [('Hand Soap', 90)])
+        self.assertEqual((on_hand_at(renamed, 'Soap'), on_hand_at(renamed, 'Hand Soap')), (0, 90))
+
+
+# time series rollups
+class TimeseriesTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.post('/api/products/create/', {
+            'product_id': 'Soap-0', 'barcode_no': '4800000000001', 'product_name': 'Soap',
+            'product_detail': 'test batch', 'product_qty': 100, 'product_expiry': '2030-01-01',
+        })
+        distrib = Distrib.objects.create(product=Product.objects.get(product_id='Soap-0'), distrib_quantity=30)
+        distrib.distrib_quantity = 20
+        distrib.save()
+
+    def rollups(self):
+        return sorted(StockRollup.objects.values_list('bucket', 'product_name', 'received', 'distributed', 'net_change'))
+
+    def test_rollups_follow_the_ledger(self):
+        self.assertEqual(self.rollups(), [('day', 'Soap', 100, 20, 80), ('hour', 'Soap', 100, 20, 80)])
+        before = self.rollups()
+        backfill()
+        self.assertEqual(self.rollups(), before)
+
+    def test_daily_and_hourly_series(self):
+        response = self.client.get('/api/reports/timeseries/')
+        series = response.json()['series']
+        self.assertEqual(len(series), 30)
+        self.assertEqual(series[-1]['received'], 100)
+        self.assertEqual(series[-1]['distributed'], 20)
+        self.assertEqual(series[-1]['on_hand'], ProductStock.objects.on_hand('Soap'))
+        self.assertEqual(series[0]['on_hand'], 0)
+
+        today = timezone.localdate().isoformat()
+        response = self.client.get('/api/reports/timeseries/', {'bucket': 'hour', 'date_from': today, 'date_to': today, 'product_name': 'Soap'})
+        series = response.json()['series']
+        self.assertEqual(len(series), 24)
+        self.assertEqual(sum(point['distributed'] for point in series), 20)
+        self.assertEqual(series[-1]['on_hand'], 80)
+
+        response = self.client.get('/api/reports/timeseries/', {'bucket': 'month', 'product_name': 'Other'})
+        self.assertTrue(all(point['on_hand'] == 0 for point in response.json()['series']))
+
+    def test_rejects_bad_ranges(self):
+        self.assertEqual(self.client.get('/api/reports/timeseries/', {'bucket': 'minute'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/reports/timeseries/', {'date_from': '2026-02-01', 'date_to': '2026-01-01'}).status_code, 400)
+        response = self.client.get('/api/reports/timeseries/', {'bucket': 'hour', 'date_from': '2026-01-01', 'date_to': '2026-06-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+# reorder points
+@unittest.skipUnless(importlib.util.find_spec('numpy'), "numpy is not installed")
+class ReorderPointTests(TestCase):
+    def history(self, product_name, units, days):
+        today = timezone.localdate()
+        StockRollup.objects.bulk_create([
+            StockRollup(bucket='day', period_start=day_start(today - timedelta(days=n)), product_name=product_name, distributed=units)
+            for n in range(1, days + 1)
+        ])
+
+    def test_demand_model_ignores_days_before_first_distribution(self):
+        import numpy as np
+        from .reorder import demand_model
+
+        demand = np.zeros((2, 365))
+        demand[1, -10:] = 4
+        seen, daily, std, reorder, cover = demand_model(demand, np.array([100.0, 100.0]))
+        self.assertEqual(seen.tolist(), [False, True])
+        self.assertEqual((daily[1], std[1], reorder[1], cover[1]), (4, 0, 28, 25))
+
+    def test_history_is_read_in_one_query(self):
+        from .reorder import load_history
+
+        self.history('Soap', 5, 3)
+        self.history('Rice', 2, 10)
+        self.history('Salt', 9, 10)
+        with self.assertNumQueries(1):
+            demand = load_history(['Rice', 'Soap'], day_start(timezone.localdate()), 5)
+        self.assertEqual(demand.tolist(), [[2, 2, 2, 2, 2], [0, 0, 5, 5, 5]])
+
+    def test_low_stock_follows_reorder_points(self):
+        from .reorder import compute_reorder_points
+
+        soap = make_batches('Soap', [1000, 1000])
+        rice = make_batches('Rice', [100])
+        make_batches('Salt', [100])
+        self.history('Soap', 50, 60)
+        self.history('Rice', 1, 60)
+
+        call_command('compute_reorder_points', '--no-scan', stdout=StringIO())
+        stock = ProductStock.objects.in_bulk(['Soap', 'Rice', 'Salt'])
+        self.assertEqual((stock['Soap'].reorder_point, stock['Soap'].days_of_cover), (350, 40))
+        self.assertEqual(stock['Rice'].reorder_point, 7)
+        self.assertIsNone(stock['Salt'].reorder_point)
+
+        # slow mover no longer low at 100; unmodelled product keeps the fixed threshold
+        self.assertFalse(rice[0].is_low_stock(stock['Rice']))
+        self.assertTrue(Product.objects.get(product_name='Salt').is_low_stock(stock['Salt']))
+        self.assertEqual(scan_inventory_alerts(full=True)['low_stock'], 1)
+
+        ProductStock.objects.rebuild()
+        self.assertEqual(ProductStock.objects.get(product_name='Soap').reorder_point, 350)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Distrib.objects.create(product=soap[0], distrib_quantity=1700)
+        self.assertTrue(Notification.objects.filter(product_id='Soap-1', notif_type='low_stock').exists())
+        self.assertEqual(compute_reorder_points()['with_reorder_point'], 2)
+
+
+# dashboard stats
+class DashboardStatsTests(ApiTestCase):
+    def test_counts_and_cache_invalidation(self):
+        User.objects.create(username='a', role='Admin')
+        User.objects.create(username='b', role='Supervisor', status='Inactive')
+        batches = make_batches('Soap', [100, 500], year=timezone.now().year + 5)
+        Product.objects.create(
+            product_id='Rice-0', barcode_no='4800000000002', product_name='Rice', product_detail='test batch',
+            product_qty=800, product_expiry=timezone.now().date() + timedelta(days=10),
+        )
+        Distrib.objects.create(product=batches[0], distrib_quantity=100)
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = self.client.get('/api/dashboard/stats/').json()
+        self.assertLessEqual(len(queries), 4)
+        self.assertEqual(stats['users'], {
+            'total': 2, 'by_role': {'Admin': 1, 'Supervisor': 1}, 'by_status': {'Active': 1, 'Inactive': 1},
+        })
+        self.assertEqual(stats['inventory'], {
+            'products': 2, 'active_batches': 2, 'archived_batches': 1, 'on_hand': 1300,
+            'low_stock': 0, 'expiring_soon': 1, 'expired': 0,
+        })
+        self.assertEqual(stats['distributions'], {'total': 1, 'active': 1, 'units': 100, 'units_last_30_days': 100})
+
+        User.objects.create(username='c')
+        self.assertEqual(self.client.get('/api/dashboard/stats/').json()['users']['total'], 3)
+
+
+# barcode resolver
+class BarcodeResolverTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        resolver.entries.clear()
+
+    def test_scan_returns_fifo_head_of_multi_batch_product(self):
+        batches = make_batches('Soap', [100, 200])
+        response = self.client.get('/api/products/barcode/4800000000001/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['product_id'], response.data['total_stock']), ('Soap-0', 300))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Distrib.objects.create(product=batches[0], distrib_quantity=150)
+        response = self.client.get('/api/products/barcode/4800000000001/')
+        self.assertEqual((response.data['product_id'], response.data['total_stock']), ('Soap-1', 150))
+
+    def test_repeat_scans_are_served_from_cache(self):
+        make_batches('Soap', [100])
+        self.client.get('/api/products/barcode/4800000000001/')
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve('4800000000001')['product_id'], 'Soap-0')
+
+    def test_writes_drop_only_the_entries_they_touch(self):
+        make_batches('Soap', [100, 100])
+        Product.objects.create(
+            product_id='Rice-0', barcode_no='4800000000002', product_name='Rice',
+            product_detail='batch', product_qty=50, product_expiry=date(2030, 1, 1),
+        )
+        resolver.resolve_many(['4800000000001', '4800000000002'])
+
+        # not until the write commits
+        with self.captureOnCommitCallbacks() as callbacks:
+            allocate_fifo('Soap', 120)
+            self.assertEqual(set(resolver.entries), {'4800000000001', '4800000000002'})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(list(resolver.entries), ['4800000000002'])
+        self.assertEqual(resolver.resolve('4800000000001')['product_id'], 'Soap-1')
+
+        # a write on another worker: this one's entry is reused until it expires
+        Product.objects.filter(product_id='Soap-1').update(product_qty=30)
+        self.assertEqual(resolver.resolve('4800000000001')['product_qty'], 80)
+        with mock.patch('api.barcodes.time.monotonic', return_value=time.monotonic() + settings.BARCODE_CACHE_SECONDS):
+            self.assertEqual(resolver.resolve('4800000000001')['product_qty'], 30)
+
+    def test_batch_scan_resolves_codes_in_one_lookup(self):
+        for i in range(30):
+            Product.objects.create(
+                product_id=f"B{i}", barcode_no=f"48{i:011d}", product_name=f"Item {i}",
+                product_detail='batch', product_qty=10, product_expiry=date(2030, 1, 1),
+            )
+        codes = [f"48{i:011d}" for i in range(30)] + ['missing']
+
+        with self.assertNumQueries(1):
+            products = resolver.resolve_many(codes)
+        self.assertEqual(len(products), 30)
+
+        response = self.client.post('/api/products/barcode/batch/', {'barcodes': codes}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['not_found'], ['missing'])
+
+
+# query budgets: max queries per list endpoint, independent of row count
+QUERY_BUDGETS = {
+    'product-list': 1,
+    'items-list': 1,
+    'distrib-list': 1,
+    'distribs-list': 1,
+    'get_users': 1,
+    'user_list': 1,
+    'grouped-products': 2,
+    'inventory-summary': 2,
+}
+
+
+class QueryBudgetTests(ApiTestCase):
+    def seed(self, rows):
+        Product.objects.all().delete()
+        User.objects.all().delete()
+        batches = [
+            Product(
+                product_id=f"P{i}", barcode_no='1', product_name=f"Item {i % 50}", product_detail='seeded',
+                product_qty=500, product_expiry=date(2030, 1, 1) + timedelta(days=i % 300),
+            )
+            for i in range(rows)
+        ]
+        Product.objects.bulk_create(batches)
+        Distrib.objects.bulk_create([Distrib(product=batch, distrib_quantity=1) for batch in batches])
+        User.objects.bulk_create([User(username=f"user{i}", contact=f"09{i:09d}") for i in range(rows)])
+        ProductStock.objects.rebuild()
+        caches['summaries'].clear()
+
+    def count_queries(self, url_name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_endpoints_stay_within_budget(self):
+        for rows in (10, 1000):
+            self.seed(rows)
+            for url_name, budget in QUERY_BUDGETS.items():
+                with self.subTest(url_name=url_name, rows=rows):
+                    self.assertLessEqual(self.count_queries(url_name), budget)
+
+
+# request metrics
+class RequestMetricsTests(ApiTestCase):
+    def test_server_timing_and_prometheus_exposition(self):
+        batches = make_batches('Soap', [100, 100])
+        response = self.client.get('/api/products/')
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"$')
+        Distrib.objects.create(product=batches[0], distrib_quantity=150)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('wsms_http_requests_total{method="GET",status="200",view="product-list"}', body)
+        self.assertIn('wsms_http_request_db_queries_bucket{view="product-list",le="1"}', body)
+        self.assertIn('wsms_fifo_batches_touched_bucket{entry_point="distribution",le="2"}', body)
+
+
+# signed-claims authentication
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        caches['auth'].clear()
+        local_claims.clear()
+        get_user_model().objects.create_user(username='ana', password='secret')
+        self.profile = User.objects.create(username='ana', role='Admin')
+        self.client = APIClient()
+        self.client.post('/api/login/', {'username': 'ana', 'password': 'secret'})
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/')
+        request.COOKIES['access_token'] = self.client.cookies['access_token'].value
+        return ClaimsJWTAuthentication().authenticate(Request(request))[0]
+
+    def test_authenticates_without_queries(self):
+        self.client.get('/api/protected/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/protected/')
+        self.assertEqual(response.json()['user'], 'ana')
+        self.assertEqual((self.authenticate().role, self.authenticate().status), ('Admin', 'Active'))
+
+    def test_change_made_on_another_worker_is_seen_once_the_local_entry_expires(self):
+        self.authenticate()
+        # another worker's delete_user: only the shared cache knows
+        caches['auth'].set(claims_key('ana'), {'changed_at': time.time() + 1, 'claims': None})
+        self.assertEqual(self.authenticate().role, 'Admin')
+        with override_settings(AUTH_CLAIMS_LOCAL_SECONDS=0):
+            local_claims.clear()
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate()
+
+    def test_update_and_delete_invalidate_issued_tokens(self):
+        response = self.client.put(f'/api/users/update/{self.profile.id}/', {'username': 'ana', 'role': 'Supervisor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.authenticate().role, 'Supervisor')
+
+        self.client.delete(f'/api/users/delete/{self.profile.id}/')
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        self.assertEqual(self.client.get('/api/protected/').status_code, 401)
+
+
+# async read endpoints
+class AsyncReadTests(TestCase):
+    def setUp(self):
+        resolver.entries.clear()
+        user = get_user_model().objects.create(username='admin')
+        self.async_client.cookies['access_token'] = str(AccessToken.for_user(user))
+
+    async def test_matches_sync_views(self):
+        await sync_to_async(make_batches)('Soap', [100, 200])
+        products = await self.async_client.get('/api/async/products/', {'page_size': 1})
+        self.assertEqual(products.status_code, 200)
+        self.assertEqual([p['product_id'] for p in products.json()['results']], ['Soap-0'])
+
+        barcode = await self.async_client.get('/api/async/products/barcode/4800000000001/')
+        self.assertEqual((barcode.json()['product_id'], barcode.json()['total_stock']), ('Soap-0', 300))
+
+        summary = await self.async_client.get('/api/async/inventory-summary/')
+        self.assertEqual(summary.json(), [{'product_name': 'Soap', 'inventory_quantity': 300, 'distributed_quantity': 0}])
+        cached = await self.async_client.get('/api/async/inventory-summary/', headers={'If-None-Match': summary['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        self.assertRegex(products['Server-Timing'], r'desc="\d+ queries"')
+
+    async def test_requires_a_valid_token(self):
+        self.async_client.cookies['access_token'] = 'not-a-token'
+        response = await self.async_client.get('/api/async/products/')
+        self.assertEqual(response.status_code, 401)
+        del self.async_client.cookies['access_token']
+        response = await self.async_client.get('/api/async/grouped-products/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_view_does_not_run_for_anonymous_callers(self):
+        del self.async_client.cookies['access_token']
+        with mock.patch('api.async_views.resolver.aresolve_many', new_callable=mock.AsyncMock) as resolve:
+            response = await self.async_client.post(
+                '/api/async/products/barcode/batch/', {'barcodes': ['4800000000001']}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 401)
+        resolve.assert_not_called()
+
+    async def test_barcode_batch_is_resolved_in_chunks(self):
+        await sync_to_async(make_batches)('Soap', [100])
+        barcodes = ['4800000000001'] + [f'{n:013d}' for n in range(250)]
+        response = await self.async_client.post(
+            '/api/async/products/barcode/batch/', {'barcodes': barcodes}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['results']), ['4800000000001'])
+        self.assertEqual(len(response.json()['not_found']), 250)
+
+
+# product categories and search
+class ProductSearchTests(ApiTestCase):
+    def create(self, product_id, name, detail='test batch'):
+        return self.client.post('/api/products/create/', {
+            'product_id': product_id, 'barcode_no': '4800000000001', 'product_name': name,
+            'product_detail': detail, 'product_qty': 100, 'product_expiry': '2030-01-01',
+        })
+
+    def test_new_products_are_classified(self):
+        self.assertEqual(self.create('K-1', 'Knorr Beef Cube').json()['category'], 'food')
+        self.assertEqual(self.create('D-1', 'Domex Classic').json()['category'], 'home_care')
+        self.assertEqual(self.create('X-1', 'Mystery Item').json()['category'], 'other')
+
+    def test_prefix_fulltext_and_category(self):
+        self.create('K-1', 'Knorr Beef Cube')
+        self.create('K-2', 'Knorr Pork Cube')
+        self.create('D-1', 'Dove Beauty Bar', detail='moisturising soap')
+        self.create('S-1', 'Surf Powder Lavender', detail='laundry soap powder')
+
+        def ids(**params):
+            response = self.client.get('/api/products/search/', params)
+            self.assertEqual(response.status_code, 200)
+            return [p['product_id'] for p in response.json()['results']]
+
+        self.assertEqual(ids(prefix='knorr'), ['K-1', 'K-2'])
+        self.assertEqual(ids(q='soap'), ['D-1', 'S-1'])
+        self.assertEqual(ids(q='soap', category='body_care'), ['D-1'])
+        self.assertEqual(ids(q='pork cube'), ['K-2'])
+
+        page = self.client.get('/api/products/search/', {'category': 'food', 'page_size': 1}).json()
+        self.assertEqual(len(page['results']), 1)
+        self.assertIsNotNone(page['next'])
+        self.assertEqual(self.client.get('/api/products/search/', {'category': 'toys'}).status_code, 400)
+
+
+# keyset pagination
+class KeysetPaginationTests(ApiTestCase):
+    def test_product_pages_follow_expiry_then_id(self):
+        make_batches('Soap', [10, 10, 10])
+        make_batches('Rice', [10, 10])
+        seen = []
+        url = '/api/products/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [row['product_id'] for row in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(seen, ['Rice-0', 'Soap-0', 'Rice-1', 'Soap-1', 'Soap-2'])
+
+    def test_lists_stay_unpaginated_without_params(self):
+        make_batches('Soap', [10, 10])
+        response = self.client.get('/api/products/', {'product_name': 'Soap'})
+        self.assertEqual(len(response.data), 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/distributions/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+# report exports
+class ReportExportTests(ApiTestCase):
+    def test_distribution_csv_streams_filtered_rows(self):
+        batches = make_batches('Soap', [100])
+        make_batches('Rice', [100])
+        Distrib.objects.create(product=batches[0], distrib_quantity=5)
+        Distrib.objects.create(product=Product.objects.get(product_id='Rice-0'), distrib_quantity=7)
+
+        response = self.client.get('/api/reports/distributions.csv', {'product_name': 'Soap'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'distrib_id,created_at,product_id,product_name,distrib_quantity,is_active')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(',Soap-0,Soap,5,True'))
+
+    def test_inventory_ndjson_chunks_by_key(self):
+        make_batches('Soap', [10] * 5)
+        rows = list(iter_rows(Product.objects.all(), INVENTORY_COLUMNS, 'product_id', chunk_size=2))
+        self.assertEqual([row[0] for row in rows], [f'Soap-{i}' for i in range(5)])
+
+        response = self.client.get('/api/reports/inventory.ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]['product_expiry'], '2030-01-01')
+
+
+# product import
+class ProductImportTests(ApiTestCase):
+    def test_csv_import_splits_over_cap_rows(self):
+        body = (
+            "product_id,barcode_no,product_name,product_detail,product_qty,product_expiry\n"
+            "TRK-1,4800000000001,Soap,bar,2500,2030-01-01\n"
+            "TRK-2,4800000000002,Rice,sack,-5,2030-01-01\n"
+            "TRK-3,4800000000003,Rice,sack,40,not-a-date\n"
+            "TRK-4,4800000000004,Rice,sack,40,2030-02-01\n"
+        )
+        response = self.client.post('/api/products/import/', body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['inserted_rows'], 2)
+        self.assertEqual(response.data['inserted_batches'], 4)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3])
+        self.assertEqual(
+            sorted(Product.objects.filter(product_name='Soap').values_list('product_id', 'product_qty')),
+            [('TRK-1', 1000), ('TRK-1-2', 1000), ('TRK-1-3', 500)]
+        )
+        stock = ProductStock.objects.get(product_name='Soap')
+        self.assertEqual((stock.on_hand, stock.active_batches, stock.earliest_expiry), (2500, 3, date(2030, 1, 1)))
+
+    def test_ndjson_import_rejects_existing_ids(self):
+        make_batches('Soap', [100])
+        body = (
+            '{"product_id": "Soap-0", "barcode_no": "1", "product_name": "Soap", '
+            '"product_detail": "bar", "product_qty": 10, "product_expiry": "2030-01-01"}\n'
+            '{"product_id": "Soap-9", "barcode_no": "1", "product_name": "Soap", '
+            '"product_detail": "bar", "product_qty": 10, "product_expiry": "2029-01-01"}\n'
+            'not json\n'
+        )
+        response = self.client.post('/api/products/import/', body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['inserted_rows'], response.data['rejected']), (1, 2))
+        self.assertEqual(ProductStock.objects.get(product_name='Soap').earliest_expiry, date(2029, 1, 1))
+
+
+# query plans
+class HotQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        batches = [
+            Product(
+                product_id=f"P{i}-{j}",
+                barcode_no=f"48{i:08d}",
+                product_name=f"Item {i}",
+                product_detail='seeded batch',
+                product_qty=(j * 37) % Product.MAX_STOCK,
+                product_expiry=date(2030, 1, 1) + timedelta(days=j),
+                is_archived=j % 3 == 0,
+            )
+            for i in range(100) for j in range(20)
+        ]
+        Product.all_objects.bulk_create(batches)
+        Distrib.objects.bulk_create([
+            Distrib(product=batch, distrib_quantity=5, is_active=n % 5 != 0)
+            for n, batch in enumerate(batches)
+        ])
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute('ANALYZE TABLE tbl_product, tbl_distrib')
+            else:
+                cursor.execute('ANALYZE')
+
+    def assertNoFullScan(self, queryset):
+        if connection.vendor == 'mysql':
+            plan = queryset.explain(format='json')
+            self.assertNotRegex(plan, r'"access_type": "ALL"', plan)
+        elif connection.vendor == 'postgresql':
+            plan = queryset.explain()
+            self.assertNotIn('Seq Scan', plan, plan)
+        else:
+            plan = queryset.explain()
+            self.assertNotRegex(plan, r'(?m)\bSCAN \w+$', plan)
+
+    def test_fifo_candidate_batches(self):
+        self.assertNoFullScan(
+            Product.objects.filter(product_name__in=['Item 5'], product_qty__gt=0)
+            .order_by('product_name', 'product_expiry', 'product_id')
+        )
+
+    def test_older_batch_check(self):
+        self.assertNoFullScan(
+            Product.objects.filter(product_name='Item 5', product_expiry__lt=date(2030, 1, 10), product_qty__gt=0)
+            .order_by('product_expiry')
+        )
+
+    def test_restore_batches(self):
+        self.assertNoFullScan(Product.objects.filter(product_name='Item 5').order_by('product_expiry', 'product_id'))
+
+    def test_barcode_lookup(self):
+        self.assertNoFullScan(
+            Product.objects.filter(barcode_no__in=['4800000005'], product_qty__gt=0)
+            .order_by('barcode_no', 'product_expiry', 'product_id')
+        )
+
+    def test_earliest_expiry_refresh(self):
+        self.assertNoFullScan(
+            Product.objects.filter(product_name__in=['Item 5', 'Item 6'], product_qty__gt=0)
+            .values('product_name').annotate(earliest=Min('product_expiry'))
+        )
+
+    def test_distributed_totals(self):
+        self.assertNoFullScan(
+            Distrib.objects.filter(is_active=True)
+            .values('product__product_name').annotate(total=Sum('distrib_quantity'))
+        )
+
+
+# benchmark suite
+class BenchmarkTests(TestCase):
+    def test_report_covers_every_scenario_at_every_scale(self):
+        report = benchmark.run(products=3, batches=2, distributions=2, scales=[1, 2], repeat=2)
+        self.assertEqual(list(report['results']), ['x1', 'x2'])
+        self.assertEqual(report['results']['x2']['rows'], {'batches': 12, 'distributions': 12})
+        self.assertIn('distribution_edit', report['results']['x1'])
+        self.assertEqual(benchmark.compare(report, report, tolerance=0), [])
+
+    def test_compare_flags_slowdowns_beyond_tolerance(self):
+        baseline = {'results': {'x1': {'distrib_list': {'median_ms': 10, 'queries': 2}}}}
+        slower = {'results': {'x1': {'distrib_list': {'median_ms': 11.5, 'queries': 2}}}}
+        self.assertEqual(benchmark.compare(slower, baseline, tolerance=0.2), [])
+        self.assertEqual(len(benchmark.compare(slower, baseline, tolerance=0.1)), 1)
+
+
+# read replica routing
+class ReplicaStickinessTests(ApiTestCase):
+    def test_writes_start_the_read_your_writes_window(self):
+        self.assertNotIn(STICKY_COOKIE, self.client.get('/api/products/').cookies)
+        response = self.client.post('/api/products/create/', {
+            'product_id': 'R-1', 'barcode_no': '4800000000002', 'product_name': 'Rice',
+            'product_detail': 'test batch', 'product_qty': 100, 'product_expiry': '2030-01-01',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], settings.READ_YOUR_WRITES_SECONDS)
+
+
+# Runs against two SQLite databases, replicate_sqlite standing in for a lagging replica:
+# add a second sqlite 'replica' to DATABASES (see project/settings.py) to enable it.
+# The test runner turns replica routing off; this class turns it back on.
+@unittest.skipUnless('replica' in settings.DATABASES, "no replica database configured")
+@override_settings(REPLICA_DATABASE_ALIAS='replica')
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(username='admin'))
+
+    def product_ids(self):
+        return [p['product_id'] for p in self.client.get('/api/products/').json()]
+
+    def test_reads_lag_until_replicated_except_right_after_a_write(self):
+        make_batches('Soap', [100])
+        replicate_sqlite()
+        self.client.post('/api/products/create/', {
+            'product_id': 'R-1', 'barcode_no': '4800000000002', 'product_name': 'Rice',
+            'product_detail': 'test batch', 'product_qty': 100, 'product_expiry': '2030-01-01',
+        })
+        self.assertEqual(self.product_ids(), ['Soap-0', 'R-1'])
+
+        del self.client.cookies[STICKY_COOKIE]
+        self.assertEqual(self.product_ids(), ['Soap-0'])
+        replicate_sqlite()
+        self.assertEqual(self.product_ids(), ['Soap-0', 'R-1'])
+
+
+# SQLite ignores select_for_update, so this only means something on MySQL
+@unittest.skipUnless(connection.features.has_select_for_update, "backend has no row locks")
+class ConcurrentDistributionTests(TransactionTestCase):
+    def test_parallel_distributions_never_oversell(self):
+        batches = make_batches('Soap', [100, 100, 100])
+        accepted = []
+        errors = []
+
+        def distribute():
+            try:
+                Distrib.objects.create(product=batches[0], distrib_quantity=40)
+                accepted.append(40)
+            except ValidationError:
+                pass  # out of stock: the expected way to lose
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=distribute) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+        quantities = list(Product.all_objects.values_list('product_qty', flat=True))
+        self.assertTrue(all(qty >= 0 for qty in quantities))
+        self.assertEqual(sum(accepted), 280)
+        self.assertEqual(sum(quantities), 300 - sum(accepted))
+        self.assertEqual(ProductStock.objects.on_hand('Soap'), 300 - sum(accepted))
@@ -3,11 +3,14 @@ from .views import (
     get_users, create_user, update_user, delete_user,
     login_view, protected_view, logout_view, refresh_token_view,
     UserListView,
-    ProductList, ProductPost, ProductDetail, ProductUpdate,
+    ProductList, ProductSearch, ProductPost, ProductImport, ProductDetail, ProductUpdate,
     ProductDeactivateView, ProductReactivateView,
-    DistribList, DistribDetail, DistribUpdateView, 
-    grouped_product_summary, get_product_by_barcode
+    DistribList, DistribBulkCreate, DistribDetail, DistribUpdateView,
+    ReportExportView, report_timeseries,
+    grouped_product_summary, inventory_distribution_summary, dashboard_stats, stock_at, summary_cache_stats,
+    distrib_preview, get_product_by_barcode, get_products_by_barcodes
 )
+from . import async_views
 from rest_framework_simplejwt import views as jwt_views
 
 from django.urls import include, path
@@ -21,19 +24,29 @@ urlpatterns = [
 
     # product
     path('products/', ProductList.as_view(), name='product-list'),
+    path('products/search/', ProductSearch.as_view(), name='product-search'),
+    path('products/stock-at/', stock_at, name='stock-at'),
     path('products/create/', ProductPost.as_view(), name='product-create'),
+    path('products/import/', ProductImport.as_view(), name='product-import'),
     path('products/id/<str:product_id>/', ProductDetail.as_view(), name='product-detail'),
     path('products/update/<str:product_id>/', ProductUpdate.as_view(), name='product-update'),
     path('products/<str:product_id>/archive/', ProductDeactivateView.as_view(), name='product-archive'), 
     path('products/<str:product_id>/reactivate/', ProductReactivateView.as_view(), name='product-reactivate'),
 
+    path('products/barcode/batch/', get_products_by_barcodes, name='product-by-barcode-batch'),
     path('products/barcode/<str:barcode_no>/', get_product_by_barcode, name='product-by-barcode'),
 
     # distribution
     path('distributions/', DistribList.as_view(), name='distrib-list'),
+    path('distributions/bulk/', DistribBulkCreate.as_view(), name='distrib-bulk'),
+    path('distributions/preview/', distrib_preview, name='distrib-preview'),
     path('distributions/<int:distrib_id>/', DistribDetail.as_view(), name='distrib-detail'),
     path('distributions/update/<int:distrib_id>/', DistribUpdateView.as_view(), name='distrib-update'),  
 
+    # reports
+    path('reports/timeseries/', report_timeseries, name='report-timeseries'),
+    path('reports/<str:report>.<str:export_format>', ReportExportView.as_view(), name='report-export'),
+
     # jwt
     path('api/token/', jwt_views.TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', jwt_views.TokenRefreshView.as_view(), name='token_refresh'),
@@ -46,6 +59,21 @@ urlpatterns = [
 
     path('api/users/', UserListView.as_view(), name='user_list'),
     path('api/grouped-products/', grouped_product_summary, name='grouped-products'),
+    path('api/inventory-summary/', inventory_distribution_summary, name='inventory-summary'),
+    path('api/cache-stats/', summary_cache_stats, name='cache-stats'),
+    path('dashboard/stats/', dashboard_stats, name='dashboard-stats'),
+
+    # async read endpoints, for ASGI deployments (project.asgi:application)
+    path('async/', include([
+        path('products/', async_views.product_list, name='async-product-list'),
+        path('products/id/<str:product_id>/', async_views.product_detail, name='async-product-detail'),
+        path('products/barcode/batch/', async_views.products_by_barcodes, name='async-product-by-barcode-batch'),
+        path('products/barcode/<str:barcode_no>/', async_views.product_by_barcode, name='async-product-by-barcode'),
+        path('distributions/', async_views.distrib_list, name='async-distrib-list'),
+        path('distributions/<int:distrib_id>/', async_views.distrib_detail, name='async-distrib-detail'),
+        path('grouped-products/', async_views.grouped_product_summary, name='async-grouped-products'),
+        path('inventory-summary/', async_views.inventory_distribution_summary, name='async-inventory-summary'),
+    ])),
 
     # alias paths to support duplicated api/api prefix in frontend URLs
     path('api/', include([
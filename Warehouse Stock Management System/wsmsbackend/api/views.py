@@ -1,8 +1,13 @@
+from datetime import timedelta
+
 from django.conf import settings
 from django.db import models
 from django.db.models import Sum
 from django.contrib.auth import authenticate
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 from rest_framework import generics, status
 from rest_framework.views import APIView
@@ -14,13 +19,30 @@ from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 
-from .models import User, Product, Distrib, Notification
+from .models import (
+    User, Product, ProductStock, Distrib, Notification, VersionConflict,
+    get_inventory_distribution_summary, get_dashboard_stats,
+)
 from .serializers import (
     UserSerializer,
     ProductSerializer,
     DistribSerializer,
     ProductReactivationSerializer,
+    DistribBulkSerializer,
+    BarcodeBatchSerializer,
 )
+from .allocation import allocate_pick_list, preview_fifo
+from .barcodes import resolver
+from .cache import versioned_response, cache_stats
+from .authentication import embed_claims, user_claims, current_claims, user_changed
+from . import metrics
+from .pagination import KeysetPagination, RequiredKeysetPagination
+from .search import prefix_filter, fulltext_filter
+from .ledger import on_hand_at
+from .categories import CATEGORY_CHOICES
+from .reports import inventory_rows, distribution_rows, stream_csv, stream_ndjson, day_start
+from .rollups import BUCKETS, timeseries
+from .importer import import_products, read_csv, read_ndjson
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
@@ -30,22 +52,40 @@ from django.db.models import Sum
 from django.core.exceptions import ValidationError
 from django.contrib.auth import authenticate
 
+def flag_param(request, name, default):
+    # ?archived=true|false|all -> True / False / None (no filter)
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    value = value.lower()
+    if value == 'all':
+        return None
+    return value in ('1', 'true', 'yes')
+
 # ------------------------- USER VIEWS -------------------------
 
+def list_users(request):
+    users = User.objects.all()
+    if request.query_params.get('status'):
+        users = users.filter(status__iexact=request.query_params['status'])
+
+    paginator = KeysetPagination(ordering=('id',))
+    page = paginator.paginate_queryset(users, request)
+    if page is not None:
+        return paginator.get_paginated_response(UserSerializer(page, many=True).data)
+    return Response(UserSerializer(users, many=True).data)
+
+
 class UserListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        return list_users(request)
 
 
 @api_view(['GET'])
 def get_users(request):
-    users = User.objects.all()
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    return list_users(request)
 
 
 @api_view(['POST'])
@@ -64,9 +104,11 @@ def update_user(request, pk):
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=404)
 
+    old_username = user.username
     serializer = UserSerializer(user, data=request.data)
     if serializer.is_valid():
         serializer.save()
+        user_changed(old_username, user)
         return Response(serializer.data)
     return Response(serializer.errors, status=400)
 
@@ -79,30 +121,137 @@ def delete_user(request, pk):
         return Response({'error': 'User not found'}, status=404)
 
     user.delete()
+    user_changed(user.username)
     return Response({'message': 'User deleted successfully'}, status=200)
 
 # ------------------------- PRODUCT VIEWS -------------------------
 
 class ProductList(generics.ListAPIView):
-    queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    keyset_ordering = ('product_expiry', 'product_id')
+
+    def get_queryset(self):
+        products = Product.all_objects.all()
+        archived = flag_param(self.request, 'archived', False)
+        if archived is not None:
+            products = products.filter(is_archived=archived)
+        if self.request.query_params.get('product_name'):
+            products = products.filter(product_name=self.request.query_params['product_name'])
+        return products
+
+
+class ProductSearch(generics.ListAPIView):
+    # ?prefix= (name starts with), ?q= (words in name or detail), ?category=; always one page
+    serializer_class = ProductSerializer
+    pagination_class = RequiredKeysetPagination
+    keyset_ordering = ('product_name', 'product_id')
+
+    def get_queryset(self):
+        params = self.request.query_params
+        products = Product.all_objects.all()
+        archived = flag_param(self.request, 'archived', False)
+        if archived is not None:
+            products = products.filter(is_archived=archived)
+        if params.get('category'):
+            products = products.filter(category=params['category'])
+        if params.get('prefix'):
+            products = prefix_filter(products, params['prefix'])
+        if params.get('q'):
+            products = fulltext_filter(products, params['q'])
+        return products
+
+    def list(self, request, *args, **kwargs):
+        category = request.query_params.get('category')
+        if category and category not in dict(CATEGORY_CHOICES):
+            return Response({'error': f"Unknown category. Use one of: {', '.join(dict(CATEGORY_CHOICES))}."}, status=400)
+        return super().list(request, *args, **kwargs)
 
 
 @api_view(['GET'])
+@versioned_response('grouped-products')
 def grouped_product_summary(request):
     products = (
-        Product.all_objects
-        .values('product_name')
-        .annotate(total_quantity=Sum('product_qty'))
+        ProductStock.objects
+        .values('product_name', total_quantity=models.F('on_hand'))
         .order_by('product_name')
     )
-    return Response(products)
+    return Response(list(products))
+
+
+@api_view(['GET'])
+@versioned_response('inventory-summary')
+def inventory_distribution_summary(request):
+    return Response(get_inventory_distribution_summary())
+
+
+@api_view(['GET'])
+@versioned_response('dashboard-stats', daily=True)
+def dashboard_stats(request):
+    return Response(get_dashboard_stats())
+
+
+@api_view(['GET'])
+def stock_at(request):
+    # ?at=<ISO timestamp>[&product_name=]: on-hand stock as it was then
+    at = parse_datetime(request.query_params.get('at') or '')
+    if at is None:
+        return Response({'error': 'Pass ?at= as an ISO timestamp.'}, status=400)
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+    product_name = request.query_params.get('product_name')
+    return Response({'at': at, 'product_name': product_name, 'on_hand': on_hand_at(at, product_name)})
+
+
+@api_view(['GET'])
+def report_timeseries(request):
+    # ?bucket=hour|day|week|month&date_from=&date_to=[&product_name=], dates inclusive;
+    # defaults to the last 30 days by day
+    params = request.query_params
+    bucket = params.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return Response({'error': f"bucket must be one of: {', '.join(BUCKETS)}."}, status=400)
+    date_to = parse_date(params.get('date_to') or '') or timezone.localdate()
+    date_from = parse_date(params.get('date_from') or '') or date_to - timedelta(days=29)
+    if date_from > date_to:
+        return Response({'error': 'date_from is after date_to.'}, status=400)
+
+    product_name = params.get('product_name') or None
+    try:
+        series = timeseries(bucket, day_start(date_from), day_start(date_to + timedelta(days=1)), product_name)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    return Response({'bucket': bucket, 'product_name': product_name, 'series': series})
+
+
+@api_view(['GET'])
+def summary_cache_stats(request):
+    return Response(cache_stats())
 
 
 class ProductPost(generics.CreateAPIView):
     serializer_class = ProductSerializer
 
 
+class ProductImport(APIView):
+    # Body is read straight from the request stream, never through request.data
+    NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+    def post(self, request):
+        if request.stream is None:
+            return Response({'error': 'No file uploaded.'}, status=400)
+
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type in self.NDJSON_TYPES:
+            rows = read_ndjson(request.stream)
+        elif content_type in ('text/csv', 'application/csv'):
+            rows = read_csv(request.stream)
+        else:
+            return Response({'error': 'Send the file as text/csv or application/x-ndjson.'}, status=415)
+
+        summary = import_products(rows)
+        return Response(summary, status=201 if summary['inserted_rows'] else 400)
+
+
 class ProductDetail(generics.RetrieveAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
@@ -114,6 +263,12 @@ class ProductUpdate(generics.UpdateAPIView):
     serializer_class = ProductSerializer
     lookup_field = 'product_id'
 
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except VersionConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
 
 class ProductDeactivateView(APIView):
     def post(self, request, product_id):
@@ -125,7 +280,10 @@ class ProductDeactivateView(APIView):
         if product.is_archived:
             return Response({'message': 'Product is already archived.'}, status=400)
 
-        product.archive()
+        try:
+            product.archive()
+        except VersionConflict as e:
+            return Response({'error': str(e)}, status=409)
         return Response({'message': f'Product {product.product_name} has been archived successfully.'})
 
 
@@ -143,10 +301,12 @@ class ProductReactivateView(APIView):
         if serializer.is_valid():
             try:
                 serializer.update(product, serializer.validated_data)
+            except VersionConflict as e:
+                return Response({'error': str(e)}, status=409)
             except Exception as e:
                 return Response({'error': str(e)}, status=400)
 
-            if product.is_low_stock():
+            if product.is_low_stock(ProductStock.objects.for_product(product.product_name)):
                 product.notify('low_stock', f"{product.product_name} is low on stock: {product.product_qty} left.")
             if product.is_expiring_soon():
                 product.notify('expiring_soon', f"{product.product_name} is expiring on {product.product_expiry}.")
@@ -162,8 +322,17 @@ class ProductReactivateView(APIView):
 # ------------------------- DISTRIBUTION VIEWS -------------------------
 
 class DistribList(generics.ListCreateAPIView):
-    queryset = Distrib.objects.filter(is_active=True)
     serializer_class = DistribSerializer
+    keyset_ordering = ('distrib_id',)
+
+    def get_queryset(self):
+        distribs = Distrib.objects.select_related('product')
+        active = flag_param(self.request, 'active', True)
+        if active is not None:
+            distribs = distribs.filter(is_active=active)
+        if self.request.query_params.get('product_name'):
+            distribs = distribs.filter(product__product_name=self.request.query_params['product_name'])
+        return distribs
 
     def create(self, request, *args, **kwargs):
         product_id = request.data.get('product')
@@ -187,11 +356,7 @@ class DistribList(generics.ListCreateAPIView):
                 f"while older batch (Exp: {older_batches.first().product_expiry}) still has stock."
             )
 
-        total_available = Product.objects.filter(
-            product_name=selected_batch.product_name,
-            product_qty__gt=0,
-            is_archived=False
-        ).aggregate(Sum('product_qty'))['product_qty__sum'] or 0
+        total_available = ProductStock.objects.on_hand(selected_batch.product_name)
 
         if distrib_quantity > total_available:
             raise ValidationError("Insufficient total stock across all batches.")
@@ -204,7 +369,7 @@ class DistribList(generics.ListCreateAPIView):
             is_archived=False
         ).order_by('product_expiry').first()
 
-        if first_batch and first_batch.is_low_stock():
+        if first_batch and first_batch.is_low_stock(ProductStock.objects.for_product(first_batch.product_name)):
             response.data['warning'] = (
                 f"⚠ Warning: {first_batch.product_name} is low on stock ({first_batch.product_qty} left)."
             )
@@ -212,8 +377,42 @@ class DistribList(generics.ListCreateAPIView):
         return response
 
 
+class DistribBulkCreate(APIView):
+    def post(self, request):
+        serializer = DistribBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        results, accepted = allocate_pick_list(
+            serializer.validated_data['lines'],
+            best_effort=serializer.validated_data['mode'] == 'best_effort',
+        )
+        return Response(
+            {
+                'mode': serializer.validated_data['mode'],
+                'accepted': accepted,
+                'distributed': sum(1 for line in results if line['status'] == 'ok') if accepted else 0,
+                'results': results,
+            },
+            status=201 if accepted else 400
+        )
+
+
+@api_view(['GET'])
+def distrib_preview(request):
+    # ?product_name=&quantity=: the batches a distribution would draw from, without writing
+    product_name = request.query_params.get('product_name')
+    try:
+        quantity = int(request.query_params.get('quantity', ''))
+    except ValueError:
+        quantity = 0
+    if not product_name or quantity < 1:
+        return Response({'error': 'Pass product_name and a positive quantity.'}, status=400)
+    return Response(preview_fifo(product_name, quantity))
+
+
 class DistribDetail(generics.RetrieveDestroyAPIView):
-    queryset = Distrib.objects.all()
+    queryset = Distrib.objects.select_related('product')
     serializer_class = DistribSerializer
     lookup_field = 'distrib_id'
 
@@ -230,10 +429,38 @@ class DistribDetail(generics.RetrieveDestroyAPIView):
 
 
 class DistribUpdateView(generics.UpdateAPIView):
-    queryset = Distrib.objects.filter(is_active=True)
+    queryset = Distrib.objects.filter(is_active=True).select_related('product')
     serializer_class = DistribSerializer
     lookup_field = 'distrib_id'
 
+# ------------------------- REPORT VIEWS -------------------------
+
+class ReportExportView(APIView):
+    REPORTS = {
+        'inventory': inventory_rows,
+        'distributions': distribution_rows,
+    }
+    FORMATS = {
+        'csv': (stream_csv, 'text/csv'),
+        'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    }
+
+    def get(self, request, report, export_format):
+        if report not in self.REPORTS or export_format not in self.FORMATS:
+            return Response({'error': 'Report not found.'}, status=404)
+
+        columns, rows = self.REPORTS[report](request.query_params)
+        stream, content_type = self.FORMATS[export_format]
+        response = StreamingHttpResponse(stream(columns, rows), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{report}.{export_format}"'
+        return response
+
+# ------------------------- METRICS -------------------------
+
+# plain Django view so Prometheus can scrape it without a JWT cookie
+def prometheus_metrics(request):
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # ------------------------- AUTHENTICATION VIEWS -------------------------
 
 @api_view(['POST'])
@@ -244,7 +471,7 @@ def login_view(request):
 
     user = authenticate(request, username=username, password=password)
     if user is not None:
-        refresh = RefreshToken.for_user(user)
+        refresh = embed_claims(RefreshToken.for_user(user), user_claims(user))
         access_token = str(refresh.access_token)
 
         response = Response({"message": "Login successful"}, status=200)
@@ -294,6 +521,11 @@ def refresh_token_view(request):
 
     try:
         refresh = RefreshToken(refresh_token)
+        if 'username' in refresh:
+            claims = current_claims(refresh)
+            if claims is None:
+                return Response({'detail': 'User no longer exists'}, status=403)
+            embed_claims(refresh, claims)
         access = str(refresh.access_token)
 
         res = Response({'access': access}, status=200)
@@ -322,9 +554,22 @@ def protected_view(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_product_by_barcode(request, barcode_no):
-    try:
-        product = Product.objects.get(barcode_no=barcode_no)
-    except Product.DoesNotExist:
+    product = resolver.resolve(barcode_no)
+    if product is None:
         return Response({'error': 'Product not found.'}, status=404)
-    serializer = ProductSerializer(product)
-    return Response(serializer.data)
+    return Response(product)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def get_products_by_barcodes(request):
+    serializer = BarcodeBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+
+    barcodes = serializer.validated_data['barcodes']
+    products = resolver.resolve_many(barcodes)
+    return Response({
+        'results': products,
+        'not_found': [barcode for barcode in dict.fromkeys(barcodes) if barcode not in products],
+    })
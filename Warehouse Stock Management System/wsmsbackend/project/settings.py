@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware', #added
+    'api.routers.ReplicaRoutingMiddleware', #added
+    'api.middleware.NotificationBatchMiddleware', #added
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,11 +69,14 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'api.authentication.CookieJWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # opt-in: lists are only paginated when ?page_size= or ?cursor= is sent
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
 }
 
 from datetime import timedelta
@@ -84,6 +91,42 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
+# Summary endpoints are cached per inventory version (api/cache.py). LocMemCache is
+# per process; with several workers point 'summaries' at FileBasedCache or DatabaseCache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'summaries': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'wsms-summaries',
+        'TIMEOUT': 3600,
+    },
+    # Changes to users' signed JWT claims (api/authentication.py). Must be shared by all
+    # workers, or a worker keeps accepting a removed user's token until it expires, so it
+    # is never LocMemCache. The table is created by migration 0020; set WSMS_REDIS_URL to
+    # use Redis instead.
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['WSMS_REDIS_URL'],
+    } if os.environ.get('WSMS_REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'tbl_auth_cache',
+    },
+}
+SUMMARY_CACHE_ALIAS = 'summaries'
+AUTH_CLAIMS_CACHE_ALIAS = 'auth'
+# each worker reuses a claims-cache answer this long: the most a revocation made on
+# another worker can lag
+AUTH_CLAIMS_LOCAL_SECONDS = 10
+# each worker answers a barcode scan from its own cache this long: the most a stock write
+# made on another worker can lag
+BARCODE_CACHE_SECONDS = 5
+
+# repeated notifications for the same batch and type within this window are merged
+NOTIFICATION_COALESCE_WINDOW = timedelta(hours=24)
+NOTIFICATION_RETENTION_DAYS = 90
+
 
 ROOT_URLCONF = 'project.urls'
 
@@ -121,6 +164,29 @@ DATABASES = {
     }    
 }
 
+# Optional read replica (api/routers.py): list, summary, barcode and report GETs read
+# from it; writes, and a client's reads for READ_YOUR_WRITES_SECONDS after it writes,
+# stay on default. Set WSMS_REPLICA_HOST to enable.
+if os.environ.get('WSMS_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['WSMS_REPLICA_HOST'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Locally, with two SQLite files and `manage.py replicate_sqlite --delay 2` as the lag:
+# DATABASES = {
+#     'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.sqlite3'},
+#     'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'replica.sqlite3'},
+# }
+# REPLICA_DATABASE_ALIAS = 'replica'
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+REPLICA_DATABASE_ALIAS = 'replica' if 'replica' in DATABASES else None
+READ_YOUR_WRITES_SECONDS = 5
+# turns replica routing off in tests unless a test opts in
+TEST_RUNNER = 'api.test_runner.PrimaryOnlyTestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
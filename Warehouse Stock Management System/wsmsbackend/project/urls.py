@@ -17,7 +17,10 @@ Including another URLconf
 from django.contrib import admin # type: ignore
 from django.urls import path, include  # type: ignore
 
+from api.views import prometheus_metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
\ No newline at end of file
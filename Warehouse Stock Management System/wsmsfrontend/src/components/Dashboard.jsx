@@ -11,45 +11,19 @@ export default function Dashboard() {
   const [distribCount, setDistribCount] = useState(null);
 
   useEffect(() => {
-    const fetchUserCount = async () => {
+    const fetchStats = async () => {
       try {
-        const response = await axios.get('http://localhost:8000/api/api/users/', {
+        const response = await axios.get('http://localhost:8000/api/dashboard/stats/', {
           withCredentials: true,
         });
-        setUserCount(response.data.length);
+        setUserCount(response.data.users.total);
+        setItemCount(response.data.inventory.active_batches);
+        setDistribCount(response.data.distributions.active);
       } catch (error) {
-        console.error('Error fetching users:', error);
+        console.error('Error fetching dashboard stats:', error);
       }
     };
-    fetchUserCount();
-  }, []);
-
-  useEffect(() => {
-    const fetchItemCount = async () => {
-      try {
-        const response = await axios.get('http://localhost:8000/api/api/items/', {
-          withCredentials: true,
-        });
-        setItemCount(response.data.length);
-      } catch (error) {
-        console.error('Error fetching items:', error);
-      }
-    };
-    fetchItemCount();
-  }, []);
-
-  useEffect(() => {
-    const fetchDistribCount = async () => {
-      try {
-        const response = await axios.get('http://localhost:8000/api/api/distribs/', {
-          withCredentials: true,
-        });
-        setDistribCount(response.data.length);
-      } catch (error) {
-        console.error('Error fetching distributions:', error);
-      }
-    };
-    fetchDistribCount();
+    fetchStats();
   }, []);
 
   const chartOptions = {
@@ -16,61 +16,25 @@ export default function ManageInventory({ items }) {
   const itemsPerPage = 5;
 
   const filteredFoodItems = items.filter(item =>
-    [
-      "Knorr Beef Cube", 
-      "Knorr Pork Cube",
-      "Knorr Chicken Cube",
-      "Knorr Sinigang Sampaloc",
-      "Knorr Sinigang Gabi",
-      "Knorr Sinigang Miso",
-      "Royal Pasta Elbow Macaroni",
-      "Royal Pasta Long Spaghetti",
-      "Energen Vanilla",
-      "555 New Sardines in Tomato Sauce",
-      "Lady's Choice Chicken Spread",
-      "Lady's Choice Ham Spread",
-      "BestFoods Peanut Butter",
-      "Lipton Ice Tea"
-    ].includes(item.product_name)
+    item.category === "food"
   ).filter(item =>
     item.product_name.toLowerCase().includes(searchFood.toLowerCase())
   );
   
   const filteredBodyCareItems = items.filter(item =>
-    [
-      "Ponds Eye Cream",
-      "Ponds Serum",
-      "Ponds Facial Mist Cleanser",
-      "Ponds UV Cream",
-      "Rexona Men's Deodorant",
-      "Rexona Women's Deodorant",
-      "Dove Deodorant",
-      "Dove Beauty Bar",
-      "Dove Body Lotion",
-      "Sunsilk Shampoo",
-      "Creamsilk Conditioner",
-      "Close up Toothpaste",
-      "Pepsodent Toothpaste",
-    ].includes(item.product_name)
+    item.category === "body_care"
   ).filter(item =>
     item.product_name.toLowerCase().includes(searchBodyCare.toLowerCase())
   );
 
   const filteredFabricEnhancers = items.filter(item =>
-    [
-      "Surf Fabcon Morning Fresh",
-      "Surf Fabcon Blossom Fresh",
-      "Surf Powder Lavender",
-    ].includes(item.product_name) 
+    item.category === "fabric_enhancers"
   ).filter(item =>
     item.product_name.toLowerCase().includes(searchFabric.toLowerCase())
   );
 
   const filteredHomeCareItems = items.filter(item =>
-    [
-      "Domex Classic",
-      "Domex Lemon Explosion"
-    ].includes(item.product_name)
+    item.category === "home_care"
   ).filter(item =>
     item.product_name.toLowerCase().includes(searchHomeCare.toLowerCase())
   );
@@ -49,6 +49,15 @@ export default function useItem() {
       return { success: true, data: res.data };
     } catch (error) {
       console.error("Update item error:", error);
+      if (error.response?.status === 409) {
+        // someone else changed it first: show their version instead of overwriting it
+        const res = await axios.get(`/products/id/${id}/`);
+        setItems((prev) =>
+          prev.map((item) => (item.product_id === id ? res.data : item))
+        );
+        alert("This item was changed by someone else. It has been reloaded; please review and try again.");
+        return { success: false, error, message: error.response.data.error };
+      }
       alert("Failed to update item.");
       return { success: false, error };
     }
@@ -11,6 +11,7 @@ export default function AddDistribForm({ onClose, addDistrib }) {
   const [groupedData, setGroupedData] = useState([]); 
   const [selectedProductQuantity, setSelectedProductQuantity] = useState(null);
   const [selectedProductId, setSelectedProductId] = useState(null);
+  const [preview, setPreview] = useState(null);
   const formRef = useRef(null);
 
   useEffect(() => {
@@ -28,6 +29,32 @@ export default function AddDistribForm({ onClose, addDistrib }) {
     fetchAvailableProducts();
   }, []);
 
+  // batches the distribution would draw from, refreshed as product or quantity change
+  useEffect(() => {
+    const quantityNum = parseInt(distrib_quantity);
+    if (!product || isNaN(quantityNum) || quantityNum <= 0) {
+      setPreview(null);
+      return;
+    }
+
+    let ignore = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await axios.get('/distributions/preview/', {
+          params: { product_name: product, quantity: quantityNum },
+        });
+        if (!ignore) setPreview(res.data);
+      } catch (err) {
+        console.error("Failed to preview distribution", err);
+      }
+    }, 300);
+
+    return () => {
+      ignore = true;
+      clearTimeout(timer);
+    };
+  }, [product, distrib_quantity]);
+
   const handleProductChange = (e) => {
     const selected = e.target.value;
     setProduct(selected);
@@ -171,6 +198,41 @@ export default function AddDistribForm({ onClose, addDistrib }) {
             </div>
           </form>
 
+          {preview && (
+            <div className="mt-5 text-sm">
+              {preview.enough_stock ? (
+                <p className="mb-2 text-gray-700">
+                  Draws from {preview.batches.length} batch{preview.batches.length === 1 ? '' : 'es'};
+                  {' '}{preview.on_hand_after} of {preview.on_hand} left afterwards.
+                </p>
+              ) : (
+                <p className="mb-2 text-red-600">
+                  Short by {preview.shortfall}: only {preview.on_hand} available.
+                </p>
+              )}
+              <table className="w-full border border-gray-300">
+                <thead className="bg-gray-100">
+                  <tr>
+                    <th className="px-2 py-1 text-left">Batch</th>
+                    <th className="px-2 py-1 text-left">Expiry</th>
+                    <th className="px-2 py-1 text-right">Take</th>
+                    <th className="px-2 py-1 text-right">Left</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {preview.batches.map((batch) => (
+                    <tr key={batch.product_id} className={batch.low_stock ? 'text-[#D88D1B]' : ''}>
+                      <td className="px-2 py-1">{batch.product_id}</td>
+                      <td className="px-2 py-1">{batch.product_expiry}</td>
+                      <td className="px-2 py-1 text-right">{batch.quantity}</td>
+                      <td className="px-2 py-1 text-right">{batch.archived ? 'archived' : batch.remaining}</td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
+            </div>
+          )}
+
           <div className="flex justify-center gap-4 mt-6">
             <button
               type="button"
@@ -109,6 +109,8 @@ export default function UpdateItemForm({ onClose, item, updateItem }) {
       product_detail,
       product_qty,
       product_expiry,
+      // rejected with 409 if the item changed after this form loaded it
+      version: item.version,
     };
 
     try {